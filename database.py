@@ -5,6 +5,22 @@ from typing import List, Dict
 from collections import defaultdict
 
 
+# Malla curricular ICOM
+# Aqui modifica la lista a tu malla
+MALLA = {
+    'primero': ["I5288", "I5247", "IG738", "IL340", "IL342", "IL341"],
+    'segundo': ["IL352", "IL345", "IL344", "IL345", "IL353", "LT251"],
+    'tercero': ["I5289", "IB056", "IL347", "IL346", "IL363", "IL349"],
+    'cuarto': ["IL354", "IB067", "IL348", "IL365", "IL362", "IL350"],
+    'quinto': ["IL355", "IL356", "IL366", "IL361", "IL364", "IL369"],
+    'sexto': ["IL351", "IL367", "CB224", "IL358"],
+    'septimo': ["IL357", "IL370", "IL372"],
+    'octavo': ["IL359", "IL368", "IL373"],
+    'noveno': ["IL360", "IL371", "IL374"],
+    'optativas': ["IL378","IL379","IL380","IL381","IL382","IL383"],
+}
+
+
 class ParserUDG(HTMLParser):
     """Parser para extraer datos del HTML de SIIAU"""
     def __init__(self):
@@ -81,21 +97,9 @@ class BaseDatos:
             except Exception as e:
                 self.logger.error(f"Error procesando clase: {e}")
 
-        # Malla curricular ICOM
-        # Aqui modifica la lista a tu malla
-        self.malla = {
-            'primero': ["I5288", "I5247", "IG738", "IL340", "IL342", "IL341"],
-            'segundo': ["IL352", "IL345", "IL344", "IL345", "IL353", "LT251"],
-            'tercero': ["I5289", "IB056", "IL347", "IL346", "IL363", "IL349"],
-            'cuarto': ["IL354", "IB067", "IL348", "IL365", "IL362", "IL350"],
-            'quinto': ["IL355", "IL356", "IL366", "IL361", "IL364", "IL369"],
-            'sexto': ["IL351", "IL367", "CB224", "IL358"],
-            'septimo': ["IL357", "IL370", "IL372"],
-            'octavo': ["IL359", "IL368", "IL373"],
-            'noveno': ["IL360", "IL371", "IL374"],
-            'optativas': ["IL378","IL379","IL380","IL381","IL382","IL383"],
-            'todo': list(self.ClaveDict.keys())
-        }
+        # Malla curricular ICOM (ver MALLA al inicio del módulo)
+        self.malla = dict(MALLA)
+        self.malla['todo'] = list(self.ClaveDict.keys())
 
     def findNRC(self, nrc):
         """Busca una clase por NRC"""
@@ -0,0 +1,285 @@
+"""
+Feed local de cambios de cupos con Server-Sent Events.
+
+Cada diff del snapshot se convierte en eventos (uno por NRC cuyo DIS cambió,
+apareció o desapareció) con número de secuencia. Los últimos eventos se
+guardan en un buffer acotado para que un consumidor que se desconecta pueda
+reanudar desde su último id. Así otras herramientas leen un solo feed en
+lugar de consultar SIIAU cada una por su cuenta.
+
+La secuencia empieza en 0 cada vez que arranca el bot, así que el id de cada
+evento es '<arranque>-<seq>', donde arranque identifica a la ejecución. Un id
+de otra ejecución no se puede reanudar aunque su secuencia exista en esta.
+
+Rutas (solo en 127.0.0.1 por defecto):
+    /eventos[?desde=ID&clave=IL355] Stream SSE. También acepta el encabezado
+                                    Last-Event-ID. Si el id pedido es de otra
+                                    ejecución o ya salió del buffer se envía un
+                                    evento 'reset' y conviene recargar /oferta.
+    /oferta                         Snapshot actual {nrc: {...}}, arranque y secuencia
+    /metricas                       Métricas del monitor y del feed en JSON
+
+Ejemplo:
+    curl -N "http://127.0.0.1:8765/eventos"
+"""
+import json
+import logging
+import select
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+MAX_EVENTOS = 5000      # Eventos que se conservan para reanudar
+KEEPALIVE = 15          # Segundos entre comentarios ':' para mantener viva la conexión
+REVISION_CONEXION = 1   # Segundos entre revisiones de si el consumidor sigue conectado
+
+
+class FeedEventos:
+    """
+    Buffer de eventos con secuencia creciente. Se registra como oyente del
+    monitor (registrar) y lo leen los hilos del servidor HTTP (desde, esperar).
+
+    Atributos:
+        eventos: deque acotada de {'seq', 'ts', 'nrc', 'clave', 'nombre', 'cupos', 'dis_anterior', 'dis_nuevo'}
+        seq: Secuencia del último evento publicado
+        arranque: Identificador de esta ejecución; prefijo de los ids SSE
+        conectados: Consumidores SSE conectados en este momento
+    """
+
+    def __init__(self, capacidad=MAX_EVENTOS, arranque=None):
+        self.eventos = deque(maxlen=capacidad)
+        self.seq = 0
+        self.arranque = arranque or uuid.uuid4().hex[:8]
+        self.conectados = 0
+        self.condicion = threading.Condition()
+
+    def registrar(self, diff, inicial):
+        """Oyente del monitor: publica un evento por NRC cuyo DIS cambió"""
+        if inicial:
+            return
+        ts = datetime.now().isoformat(timespec='seconds')
+        nuevos = []
+        for nrc, (previa, clase) in sorted(diff.items()):
+            dis_anterior = previa.cupos_disponibles() if previa is not None else None
+            dis_nuevo = clase.cupos_disponibles() if clase is not None else None
+            if dis_anterior == dis_nuevo:
+                continue  # Cambió otro dato (profesor, aula, ...), no los cupos
+            materia = clase if clase is not None else previa
+            nuevos.append({
+                'ts': ts,
+                'nrc': nrc,
+                'clave': materia.getClave(),
+                'nombre': materia.getNombre(),
+                'cupos': materia.cupos_totales(),
+                'dis_anterior': dis_anterior,
+                'dis_nuevo': dis_nuevo,
+            })
+        if not nuevos:
+            return
+        with self.condicion:
+            for evento in nuevos:
+                self.seq += 1
+                evento['seq'] = self.seq
+                self.eventos.append(evento)
+            self.condicion.notify_all()
+
+    def id_evento(self, seq):
+        """Id SSE de la secuencia seq en esta ejecución"""
+        return f"{self.arranque}-{seq}"
+
+    @staticmethod
+    def leer_id(texto):
+        """(arranque, seq) de un id '<arranque>-<seq>'; arranque es None si el id no lo trae. ValueError si no es un id"""
+        arranque, _, seq = texto.strip().rpartition('-')
+        return arranque or None, int(seq)
+
+    def desde(self, arranque, seq):
+        """
+        Eventos posteriores a seq como (reset, eventos). reset es True si
+        faltan eventos: arranque no es el de esta ejecución (la secuencia
+        volvió a empezar y seq no dice nada) o ya salieron del buffer. Con
+        reset los eventos son todos los del buffer.
+        """
+        with self.condicion:
+            if arranque != self.arranque:
+                return True, list(self.eventos)
+            primero = self.eventos[0]['seq'] if self.eventos else self.seq + 1
+            reset = seq > self.seq or seq < primero - 1
+            return reset, [e for e in self.eventos if e['seq'] > seq]
+
+    def esperar(self, seq, timeout):
+        """Bloquea hasta que haya eventos posteriores a seq o pase timeout"""
+        with self.condicion:
+            return self.condicion.wait_for(lambda: self.seq > seq, timeout)
+
+    def metricas(self):
+        return {
+            'arranque': self.arranque,
+            'seq': self.seq,
+            'eventos_en_buffer': len(self.eventos),
+            'capacidad_buffer': self.eventos.maxlen,
+            'consumidores': self.conectados,
+        }
+
+
+class ServidorEventos:
+    """
+    Servidor HTTP en un hilo que expone el feed, la oferta y las métricas.
+
+    Args:
+        feed: FeedEventos
+        monitor: SiiauMonitor del que se leen la oferta y sus métricas
+    """
+
+    def __init__(self, feed, monitor, puerto=8765, host='127.0.0.1'):
+        self.feed = feed
+        self.monitor = monitor
+        self.puerto = puerto
+        self.host = host
+        self.detenido = threading.Event()
+
+    def iniciar(self):
+        servicio = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                servicio.atender(self)
+
+        self.httpd = ThreadingHTTPServer((self.host, self.puerto), Manejador)
+        self.httpd.daemon_threads = True
+        self.hilo = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.hilo.start()
+        logger.info(f"Feed de eventos en http://{self.host}:{self.httpd.server_address[1]}/eventos")
+        return self
+
+    def detener(self):
+        self.detenido.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def atender(self, manejador):
+        url = urlparse(manejador.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        try:
+            if url.path == '/eventos':
+                self.transmitir(manejador, params)
+            elif url.path == '/oferta':
+                self.responder_json(manejador, self.oferta())
+            elif url.path == '/metricas':
+                self.responder_json(manejador, {'monitor': self.monitor.metricas(), 'feed': self.feed.metricas()})
+            else:
+                self.responder_json(manejador, {'error': 'ruta no encontrada'}, 404)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # El consumidor cerró la conexión
+
+    def oferta(self):
+        # La secuencia se lee antes que la oferta: al reanudar desde ella, en el
+        # peor caso se repiten eventos ya aplicados, y dis_nuevo es absoluto.
+        # Se reanuda con desde=<arranque>-<seq>
+        seq = self.feed.seq
+        materias = {
+            nrc: {
+                'clave': clase.getClave(),
+                'nombre': clase.getNombre(),
+                'cupos': clase.cupos_totales(),
+                'dis': clase.cupos_disponibles(),
+            }
+            for nrc, clase in self.monitor.materias_cache.items()
+        }
+        return {'arranque': self.feed.arranque, 'seq': seq, 'desactualizado': self.monitor.desactualizado, 'materias': materias}
+
+    @staticmethod
+    def responder_json(manejador, datos, codigo=200):
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode('utf-8')
+        manejador.send_response(codigo)
+        manejador.send_header('Content-Type', 'application/json; charset=utf-8')
+        manejador.send_header('Content-Length', str(len(cuerpo)))
+        manejador.end_headers()
+        manejador.wfile.write(cuerpo)
+
+    def transmitir(self, manejador, params):
+        """Stream SSE: reenvía el buffer desde el id pedido y luego los eventos nuevos"""
+        pedido = manejador.headers.get('Last-Event-ID') or params.get('desde')
+        arranque, seq = self.feed.arranque, self.feed.seq
+        if pedido is not None:
+            try:
+                arranque, seq = self.feed.leer_id(pedido)
+            except ValueError:
+                pass  # Id inválido: se transmite desde ahora
+        clave = params.get('clave', '').upper() or None
+
+        manejador.send_response(200)
+        manejador.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        manejador.send_header('Cache-Control', 'no-cache')
+        manejador.send_header('Connection', 'keep-alive')
+        manejador.end_headers()
+
+        with self.feed.condicion:
+            self.feed.conectados += 1
+        try:
+            while not self.detenido.is_set():
+                reset, eventos = self.feed.desde(arranque, seq)
+                if reset:
+                    # Faltan eventos: el consumidor debe recargar /oferta; el stream
+                    # sigue desde la secuencia actual de esta ejecución
+                    arranque, seq = self.feed.arranque, self.feed.seq
+                    ultimo = self.feed.id_evento(seq)
+                    self.enviar(manejador, 'reset', {'pedido': pedido, 'ultimo': ultimo}, ultimo)
+                    eventos = [e for e in eventos if e['seq'] > seq]
+                for evento in eventos:
+                    if clave is None or evento['clave'] == clave:
+                        self.enviar(manejador, 'cupos', evento, self.feed.id_evento(evento['seq']))
+                    seq = evento['seq']
+                if not eventos and not reset:
+                    manejador.wfile.write(b": keepalive\n\n")
+                    manejador.wfile.flush()
+                if not self.esperar_eventos(manejador, seq):
+                    break
+        finally:
+            with self.feed.condicion:
+                self.feed.conectados -= 1
+
+    def esperar_eventos(self, manejador, seq):
+        """
+        Espera eventos posteriores a seq hasta KEEPALIVE segundos, revisando
+        cada REVISION_CONEXION si el consumidor cerró la conexión (así deja de
+        contarse en 'consumidores' sin esperar a que falle el keepalive).
+        Retorna False si se desconectó.
+        """
+        fin = time.monotonic() + KEEPALIVE
+        while not self.detenido.is_set():
+            restante = fin - time.monotonic()
+            if restante <= 0 or self.feed.esperar(seq, min(REVISION_CONEXION, restante)):
+                return True
+            if self.desconectado(manejador):
+                return False
+        return True
+
+    @staticmethod
+    def desconectado(manejador):
+        """Un consumidor SSE no envía nada después de la petición: si el socket se puede leer y no trae datos, cerró"""
+        conexion = manejador.connection
+        try:
+            legible, _, _ = select.select([conexion], [], [], 0)
+            return bool(legible) and conexion.recv(1, socket.MSG_PEEK) == b''
+        except OSError:
+            return True
+
+    @staticmethod
+    def enviar(manejador, tipo, datos, id_evento=None):
+        mensaje = f"event: {tipo}\n"
+        if id_evento is not None:
+            mensaje += f"id: {id_evento}\n"
+        mensaje += f"data: {json.dumps(datos, ensure_ascii=False)}\n\n"
+        manejador.wfile.write(mensaje.encode('utf-8'))
+        manejador.wfile.flush()
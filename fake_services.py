@@ -0,0 +1,211 @@
+"""
+Servicios locales falsos para probar el bot sin red.
+
+- ServidorSIIAUFalso: sirve una oferta con el mismo HTML que SIIAU y cambia los
+  cupos disponibles de algunas secciones en cada consulta.
+- ServidorTelegramFalso: implementa lo mínimo de la Bot API (getMe, getUpdates,
+  sendMessage, ...) y registra los mensajes enviados. Se le pueden encolar
+  comandos como si los escribiera un usuario.
+
+Ambos corren en un hilo con http.server y se usan desde sharding.py y soak_test.py.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+HORAS = ['0700-0855', '0900-1055', '1100-1255', '1300-1455', '1500-1655', '1700-1855', '1900-2055']
+DIAS = ['L . I . . .', '. M . J . .', '. . . . V .', 'L . . . . .', '. . . . . S']
+
+
+def update_comando(update_id, user_id, texto):
+    """Update de Telegram (como dict JSON) de un mensaje de texto con un comando"""
+    comando = texto.split()[0]
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': int(user_id), 'type': 'private'},
+            'from': {'id': int(user_id), 'is_bot': False, 'first_name': f"U{user_id}"},
+            'text': texto,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(comando)}],
+        },
+    }
+
+
+class _Servidor:
+    """Base común: levanta un ThreadingHTTPServer en un puerto libre"""
+
+    def iniciar(self):
+        servicio = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                servicio.atender(self, None)
+
+            def do_POST(self):
+                longitud = int(self.headers.get('Content-Length') or 0)
+                servicio.atender(self, self.rfile.read(longitud))
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Manejador)
+        self.httpd.daemon_threads = True
+        self.hilo = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.hilo.start()
+        return self
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def detener(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    @staticmethod
+    def responder(manejador, codigo, cuerpo, tipo='application/json'):
+        datos = cuerpo.encode('latin-1' if tipo.startswith('text/html') else 'utf-8')
+        manejador.send_response(codigo)
+        manejador.send_header('Content-Type', tipo)
+        manejador.send_header('Content-Length', str(len(datos)))
+        manejador.end_headers()
+        try:
+            manejador.wfile.write(datos)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # El cliente cerró la conexión (p. ej. un worker que se detuvo)
+
+
+class ServidorSIIAUFalso(_Servidor):
+    """
+    Oferta académica sintética servida con el formato de tablas de SIIAU.
+
+    Args:
+        secciones: Número de secciones (NRCs) en la oferta
+        claves: Número de claves distintas entre las que se reparten
+        cambios: Fracción de secciones cuyo DIS cambia en cada consulta
+        semilla: Semilla del generador para obtener ofertas reproducibles
+    """
+
+    def __init__(self, secciones=500, claves=60, cambios=0.02, semilla=1):
+        self.rng = random.Random(semilla)
+        self.cambios = cambios
+        self.peticiones = 0
+        self.lock = threading.Lock()
+        self.filas = []
+        for i in range(secciones):
+            clave = f"IL{300 + i % claves}"
+            cupos = self.rng.choice([20, 30, 40])
+            self.filas.append({
+                'nrc': str(100000 + i),
+                'clave': clave,
+                'materia': f"MATERIA {clave}",
+                'sec': f"D{i // claves + 1:02d}",
+                'cup': cupos,
+                'dis': self.rng.randint(0, 3),
+                'hora': self.rng.choice(HORAS),
+                'dias': self.rng.choice(DIAS),
+                'profesor': f"PROFESOR {self.rng.randint(1, 80)}",
+            })
+
+    def mutar(self):
+        """Cambia el DIS de una fracción de las secciones"""
+        for fila in self.rng.sample(self.filas, max(1, int(len(self.filas) * self.cambios))):
+            fila['dis'] = max(0, min(fila['cup'], fila['dis'] + self.rng.choice([-2, -1, 1, 2])))
+
+    def html(self):
+        filas = []
+        for f in self.filas:
+            filas.append(
+                "<tr>"
+                f"<td>CUCEI</td><td>{f['nrc']}</td><td>{f['clave']}</td><td>{f['materia']}</td>"
+                f"<td>{f['sec']}</td><td>8</td><td>{f['cup']}</td><td>{f['dis']}</td>"
+                f"<td><table><tr><td>01</td><td>{f['hora']}</td><td>{f['dias']}</td>"
+                "<td>DEDX</td><td>A001</td><td>01/08/25 - 01/12/25</td></tr></table></td>"
+                f"<td><table><tr><td>01</td><td>{f['profesor']}</td></tr></table></td>"
+                "</tr>"
+            )
+        return "<html><body><table>" + "".join(filas) + "</table></body></html>"
+
+    def atender(self, manejador, cuerpo):
+        with self.lock:
+            self.peticiones += 1
+            if self.peticiones > 1:
+                self.mutar()
+            html = self.html()
+        self.responder(manejador, 200, html, 'text/html; charset=latin-1')
+
+
+class ServidorTelegramFalso(_Servidor):
+    """
+    Bot API mínima. Acepta rutas /bot<token>/<método> y /w<k>/bot<token>/<método>;
+    el prefijo /w<k> permite saber qué worker hizo cada llamada.
+
+    Atributos:
+        enviados: [{'worker', 'chat_id', 'text', 'ts'}] mensajes recibidos por sendMessage
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.enviados = []
+        self.updates = []
+        self.siguiente_update = 1
+        self.siguiente_mensaje = 1
+
+    def encolar_comando(self, user_id, texto):
+        """Simula que el usuario user_id escribe texto (p. ej. '/suscribir 100001')"""
+        with self.lock:
+            self.updates.append(update_comando(self.siguiente_update, user_id, texto))
+            self.siguiente_update += 1
+
+    def _parametros(self, manejador, cuerpo):
+        tipo = manejador.headers.get('Content-Type', '')
+        if not cuerpo:
+            return {}
+        if 'json' in tipo:
+            return json.loads(cuerpo)
+        return {k: v[0] for k, v in parse_qs(cuerpo.decode('utf-8')).items()}
+
+    def atender(self, manejador, cuerpo):
+        partes = urlparse(manejador.path).path.strip('/').split('/')
+        worker = None
+        if partes and partes[0].startswith('w') and partes[0][1:].isdigit():
+            worker = int(partes[0][1:])
+            partes = partes[1:]
+        metodo = partes[-1] if partes else ''
+        params = self._parametros(manejador, cuerpo)
+        resultado = self.metodo(metodo, params, worker)
+        self.responder(manejador, 200, json.dumps({'ok': True, 'result': resultado}))
+
+    def metodo(self, metodo, params, worker):
+        if metodo == 'getMe':
+            return {'id': 1, 'is_bot': True, 'first_name': 'SIIAUBot', 'username': 'siiau_fake_bot'}
+        if metodo == 'getUpdates':
+            offset = int(params.get('offset') or 0)
+            with self.lock:
+                self.updates = [u for u in self.updates if u['update_id'] >= offset]
+                pendientes = list(self.updates)
+            if not pendientes:
+                time.sleep(min(float(params.get('timeout') or 0), 0.2))
+            return pendientes
+        if metodo == 'sendMessage':
+            with self.lock:
+                mensaje_id = self.siguiente_mensaje
+                self.siguiente_mensaje += 1
+                self.enviados.append({
+                    'worker': worker,
+                    'chat_id': str(params.get('chat_id')),
+                    'text': params.get('text', ''),
+                    'ts': time.time(),
+                })
+            return {
+                'message_id': mensaje_id,
+                'date': int(time.time()),
+                'chat': {'id': int(params.get('chat_id', 0)), 'type': 'private'},
+                'text': params.get('text', ''),
+            }
+        return True
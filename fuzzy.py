@@ -0,0 +1,265 @@
+"""
+Índice aproximado para sugerencias "¿Quisiste decir...?" sobre NRCs, claves
+y nombres de materias.
+
+- NRCs y claves: se generan las variantes a distancia de edición 1 de la
+  consulta (borrar, cambiar, insertar o transponer un carácter) y se buscan en
+  diccionarios. El costo depende del largo del código, no del tamaño de la oferta.
+- Nombres: listas de postings de trigramas sobre los nombres normalizados
+  distintos. Se recorren completas las listas de los trigramas más raros de la
+  consulta mientras quepan en un presupuesto fijo de postings (una lista que no
+  cabe se salta: sus entradas no distinguen), y se ordena por distancia de
+  edición un número acotado de candidatos. El trabajo por consulta crece con
+  la oferta hasta llenar ese presupuesto y después queda topado.
+
+Benchmark de latencia contra el tamaño de la oferta:
+    python fuzzy.py --benchmark
+"""
+import heapq
+import random
+import string
+import sys
+import time
+import unicodedata
+from collections import defaultdict
+
+ALFABETO_NRC = string.digits
+ALFABETO_CLAVE = string.ascii_uppercase + string.digits
+
+MAX_TRIGRAMAS = 6       # Trigramas (los más raros) que se consultan por nombre
+MAX_POSTINGS = 1024     # Entradas de postings que se recorren como máximo por consulta
+MAX_CANDIDATOS = 10     # Candidatos a los que se les calcula la distancia
+MAX_SUGERENCIAS = 3
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.lower().split())
+
+
+def distancia(a, b, tope=None):
+    """
+    Distancia de Levenshtein (dos filas). Con tope solo se calculan las celdas
+    de la banda |i - j| <= tope (las de fuera ya pasan del tope), se corta en
+    cuanto la distancia no puede quedar por debajo de él y se retorna tope + 1.
+    """
+    # Los prefijos y sufijos comunes no cambian la distancia; con un solo error
+    # de captura casi toda la cadena se descarta aquí
+    inicio = 0
+    while inicio < len(a) and inicio < len(b) and a[inicio] == b[inicio]:
+        inicio += 1
+    a, b = a[inicio:], b[inicio:]
+    while a and b and a[-1] == b[-1]:
+        a, b = a[:-1], b[:-1]
+    if len(a) < len(b):
+        a, b = b, a
+    if tope is None:
+        anterior = list(range(len(b) + 1))
+        for i, ca in enumerate(a, 1):
+            actual = [i]
+            for j, cb in enumerate(b, 1):
+                actual.append(min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + (ca != cb)))
+            anterior = actual
+        return anterior[-1]
+    fuera = tope + 1
+    if len(a) - len(b) > tope:
+        return fuera
+    anterior = [min(j, fuera) for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        desde, hasta = max(1, i - tope), min(len(b), i + tope)
+        actual = [fuera] * (len(b) + 1)
+        actual[0] = min(i, fuera)
+        for j in range(desde, hasta + 1):
+            actual[j] = min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + (ca != b[j - 1]))
+        if min(actual[desde - 1:hasta + 1]) > tope:
+            return fuera
+        anterior = actual
+    return min(anterior[-1], fuera)
+
+
+def variantes(codigo, alfabeto):
+    """Todas las cadenas a distancia de edición 1 de codigo"""
+    resultado = set()
+    for i in range(len(codigo) + 1):
+        izq, der = codigo[:i], codigo[i:]
+        if der:
+            resultado.add(izq + der[1:])
+            for c in alfabeto:
+                resultado.add(izq + c + der[1:])
+        if len(der) > 1:
+            resultado.add(izq + der[1] + der[0] + der[2:])
+        for c in alfabeto:
+            resultado.add(izq + c + der)
+    resultado.discard(codigo)
+    return resultado
+
+
+def trigramas(texto):
+    texto = f"  {texto} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceDifuso:
+    """
+    Índice de un snapshot de la oferta.
+
+    Args:
+        materias: {nrc: Clase} del snapshot
+
+    Atributos:
+        nrcs: {nrc: Clase}
+        claves: {clave: nombre de la materia}
+        nombres: [(nombre normalizado, clave)] distintos
+        postings: {trigrama: [índice en nombres]}
+    """
+
+    def __init__(self, materias):
+        self.nrcs = dict(materias)
+        self.claves = {}
+        vistos = {}
+        for clase in materias.values():
+            clave = str(clase.getClave()).upper()
+            self.claves.setdefault(clave, clase.getNombre())
+            vistos.setdefault(normalizar(clase.getNombre()), clave)
+        self.nombres = list(vistos.items())
+        self.postings = defaultdict(list)
+        for i, (nombre, _) in enumerate(self.nombres):
+            for t in trigramas(nombre):
+                self.postings[t].append(i)
+
+    def sugerir_nrc(self, consulta):
+        return [n for n in variantes(consulta, ALFABETO_NRC) if n in self.nrcs]
+
+    def sugerir_clave(self, consulta):
+        return [c for c in variantes(consulta.upper(), ALFABETO_CLAVE) if c in self.claves]
+
+    def sugerir_nombre(self, consulta, limite=MAX_SUGERENCIAS):
+        """Claves cuyo nombre se parece a la consulta: [(distancia, nombre, clave)]"""
+        consulta = normalizar(consulta)
+        if len(consulta) < 3:
+            return []
+        listas = sorted((self.postings[t] for t in trigramas(consulta) if t in self.postings), key=len)
+        if not listas:
+            return []
+        # Las listas van de la más corta a la más larga: en cuanto una no cabe
+        # en lo que queda del presupuesto, tampoco caben las siguientes
+        usadas = []
+        restante = MAX_POSTINGS
+        for lista in listas[:MAX_TRIGRAMAS]:
+            if len(lista) > restante:
+                break
+            usadas.append(lista)
+            restante -= len(lista)
+        if not usadas:
+            # Solo hay trigramas comunes: se toma un tramo de la más rara
+            usadas = [listas[0][:MAX_POSTINGS]]
+        conteo = defaultdict(int)
+        for lista in usadas:
+            for i in lista:
+                conteo[i] += 1
+        # Solo se calcula la distancia de candidatos que comparten al menos la
+        # mitad de los trigramas recorridos y a lo más uno menos que el mejor:
+        # en ofertas grandes muchos nombres comparten unos pocos trigramas
+        minimo = max((len(usadas) + 1) // 2, max(conteo.values()) - 1)
+        candidatos = [i for i in heapq.nlargest(MAX_CANDIDATOS, conteo, key=conteo.get)
+                      if conteo[i] >= minimo]
+        tope = max(2, len(consulta) // 3)
+        puntuados = []
+        for i in candidatos:
+            nombre, clave = self.nombres[i]
+            d = distancia(consulta, nombre, tope)
+            if d > tope and len(nombre) > len(consulta):
+                # Comparar contra el prefijo del mismo largo permite sugerir con nombres incompletos
+                d = distancia(consulta, nombre[:len(consulta)], tope) + 1
+            if d <= tope:
+                puntuados.append((d, nombre, clave))
+        puntuados.sort()
+        return puntuados[:limite]
+
+    def sugerir(self, consulta, limite=MAX_SUGERENCIAS):
+        """
+        Sugerencias para una consulta que no se encontró.
+        Retorna [(codigo, descripcion)] con NRCs, claves o ambos.
+        """
+        consulta = consulta.strip()
+        sugerencias = []
+        if consulta.isdigit():
+            for nrc in sorted(self.sugerir_nrc(consulta))[:limite]:
+                clase = self.nrcs[nrc]
+                sugerencias.append((nrc, f"{clase.getNombre()} ({clase.getClave()})"))
+            return sugerencias
+        if len(consulta) <= 6 and any(c.isdigit() for c in consulta):
+            for clave in sorted(self.sugerir_clave(consulta))[:limite]:
+                sugerencias.append((clave, self.claves[clave]))
+            if sugerencias:
+                return sugerencias
+        for _, nombre, clave in self.sugerir_nombre(consulta, limite):
+            sugerencias.append((clave, self.claves[clave]))
+        return sugerencias
+
+
+def formatear_sugerencias(sugerencias):
+    """Texto Markdown para agregar a un mensaje de 'No se encontró'"""
+    if not sugerencias:
+        return ""
+    lineas = "\n".join(f"• `{codigo}` - {descripcion}" for codigo, descripcion in sugerencias)
+    return f"\n\n💡 *¿Quisiste decir?*\n{lineas}"
+
+
+def benchmark(tamanos=(1000, 10000, 100000, 300000), consultas=300, semilla=7):
+    """Mide la latencia de sugerir() con ofertas sintéticas de distintos tamaños"""
+
+    class ClaseSintetica:
+        def __init__(self, nrc, clave, nombre):
+            self.nrc, self.clave, self.nombre = nrc, clave, nombre
+
+        def getNRC(self):
+            return self.nrc
+
+        def getClave(self):
+            return self.clave
+
+        def getNombre(self):
+            return self.nombre
+
+    palabras = ["ALGEBRA", "CALCULO", "LINEAL", "DIFERENCIAL", "INTEGRAL", "PROGRAMACION", "ESTRUCTURAS",
+                "DATOS", "SISTEMAS", "OPERATIVOS", "REDES", "COMPUTADORAS", "TEORIA", "COMPUTACION",
+                "BASES", "INGENIERIA", "SOFTWARE", "ARQUITECTURA", "SEMINARIO", "SOLUCION", "PROBLEMAS",
+                "FISICA", "ELECTRONICA", "DIGITAL", "METODOS", "NUMERICOS", "MATEMATICAS", "DISCRETAS"]
+    rng = random.Random(semilla)
+
+    def con_error(texto, alfabeto=string.ascii_uppercase):
+        i = rng.randrange(len(texto))
+        return texto[:i] + rng.choice(alfabeto) + texto[i + 1:]
+
+    print(f"{'secciones':>10} {'nombres':>8} {'NRC (us)':>10} {'clave (us)':>11} {'nombre (us)':>12} {'aciertos':>9}")
+    for n in tamanos:
+        materias = {}
+        n_claves = max(50, n // 20)
+        nombres = [" ".join(rng.sample(palabras, 3)) + f" {k}" for k in range(n_claves)]
+        for i in range(n):
+            k = i % n_claves
+            nrc = str(100000 + i * 7)
+            materias[nrc] = ClaseSintetica(nrc, f"I{k:05d}", nombres[k])
+        indice = IndiceDifuso(materias)
+        muestras = rng.sample(list(materias.values()), consultas)
+        tiempos = []
+        for generar in (lambda c: con_error(c.getNRC(), string.digits),
+                        lambda c: con_error(c.getClave()),
+                        lambda c: con_error(c.getNombre())):
+            lista = [generar(c) for c in muestras]
+            inicio = time.perf_counter()
+            respuestas = [indice.sugerir(q) for q in lista]
+            tiempos.append((time.perf_counter() - inicio) / len(lista) * 1e6)
+        # Aciertos en nombres: la clave correcta aparece entre las sugerencias
+        aciertos = sum(any(codigo == c.getClave() for codigo, _ in r) for c, r in zip(muestras, respuestas))
+        print(f"{n:>10} {len(indice.nombres):>8} {tiempos[0]:>10.1f} {tiempos[1]:>11.1f} "
+              f"{tiempos[2]:>12.1f} {aciertos / len(muestras):>8.0%}")
+
+
+if __name__ == '__main__':
+    if '--benchmark' in sys.argv:
+        benchmark()
+    else:
+        print(__doc__)
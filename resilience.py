@@ -0,0 +1,244 @@
+"""
+Consulta a SIIAU tolerante a fallas.
+
+- InterruptorCircuito: después de varias consultas fallidas seguidas deja de
+  consultar SIIAU durante un enfriamiento. Luego deja pasar una sola consulta
+  de prueba (semiabierto) y vuelve a cerrarse si tiene éxito.
+- ClienteSIIAU: descarga con timeout por petición, reintentos con backoff
+  exponencial y jitter, y una petición de cobertura (hedge) cuando la primera
+  tarda más que el percentil p90 de las latencias recientes. Todo dentro de un
+  presupuesto de tiempo por consulta.
+
+Mientras el circuito está abierto la consulta falla de inmediato y el monitor
+sirve el último snapshot bueno marcado como desactualizado.
+
+descargar() bloquea (esperas del backoff y de la cobertura): desde el event
+loop del bot se llama en un hilo con asyncio.to_thread.
+"""
+import logging
+import random
+import ssl
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib import request
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT = 10                # Segundos máximos por petición HTTP
+PRESUPUESTO = 25            # Segundos máximos por consulta, con reintentos (ciclo de monitoreo)
+PRESUPUESTO_COMANDO = 8     # Segundos máximos cuando la consulta la dispara un comando
+REINTENTOS = 2
+ESPERA_BASE = 0.5           # Backoff: espera aleatoria en [0, ESPERA_BASE * 2^intento]
+ESPERA_MAXIMA = 5
+PERCENTIL_COBERTURA = 0.9   # Se lanza la cobertura si la petición tarda más que este percentil
+RETRASO_MINIMO = 0.5        # Nunca se cubre antes de este retraso
+MIN_MUESTRAS = 5            # Latencias necesarias antes de empezar a cubrir
+UMBRAL_FALLOS = 3           # Consultas fallidas seguidas que abren el circuito
+ENFRIAMIENTO = 60           # Segundos con el circuito abierto antes de probar de nuevo
+
+
+def percentil(valores, p):
+    """Percentil p (0-1) por el método del rango más cercano; None si no hay valores"""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, max(0, int(round(p * len(ordenados))) - 1))]
+
+
+class ErrorSIIAU(Exception):
+    """La consulta a SIIAU falló después de los reintentos"""
+
+
+class CircuitoAbierto(ErrorSIIAU):
+    """El circuito está abierto y no se intentó consultar SIIAU"""
+
+
+class InterruptorCircuito:
+    """
+    Estados: cerrado (se consulta normal), abierto (no se consulta) y
+    semiabierto (pasó el enfriamiento, se permite una consulta de prueba).
+    """
+
+    CERRADO = 'cerrado'
+    ABIERTO = 'abierto'
+    SEMIABIERTO = 'semiabierto'
+
+    def __init__(self, umbral=UMBRAL_FALLOS, enfriamiento=ENFRIAMIENTO, reloj=time.monotonic):
+        self.umbral = umbral
+        self.enfriamiento = enfriamiento
+        self.reloj = reloj
+        self.fallos_consecutivos = 0
+        self.aperturas = 0
+        self.abierto_hasta = None
+        self.prueba_en_curso = False
+
+    @property
+    def estado(self):
+        if self.abierto_hasta is None:
+            return InterruptorCircuito.CERRADO
+        if self.reloj() < self.abierto_hasta:
+            return InterruptorCircuito.ABIERTO
+        return InterruptorCircuito.SEMIABIERTO
+
+    def permite(self):
+        estado = self.estado
+        if estado == InterruptorCircuito.ABIERTO:
+            return False
+        if estado == InterruptorCircuito.SEMIABIERTO:
+            if self.prueba_en_curso:
+                return False
+            self.prueba_en_curso = True
+        return True
+
+    def exito(self):
+        if self.abierto_hasta is not None:
+            logger.info("SIIAU respondió; circuito cerrado")
+        self.fallos_consecutivos = 0
+        self.abierto_hasta = None
+        self.prueba_en_curso = False
+
+    def fallo(self):
+        self.fallos_consecutivos += 1
+        semiabierto = self.prueba_en_curso
+        self.prueba_en_curso = False
+        if semiabierto or self.fallos_consecutivos >= self.umbral:
+            self.abierto_hasta = self.reloj() + self.enfriamiento
+            self.aperturas += 1
+            logger.warning(f"Circuito de SIIAU abierto por {self.enfriamiento} s "
+                           f"({self.fallos_consecutivos} fallos seguidos)")
+
+    def segundos_restantes(self):
+        if self.estado != InterruptorCircuito.ABIERTO:
+            return 0
+        return self.abierto_hasta - self.reloj()
+
+
+class ClienteSIIAU:
+    """
+    Descarga páginas de SIIAU con reintentos, cobertura e interruptor.
+
+    Atributos:
+        interruptor: InterruptorCircuito compartido por todas las consultas
+        latencias: Duración de las últimas peticiones exitosas (segundos)
+        contadores: Totales de consultas, peticiones, reintentos, coberturas, fallos y rechazos
+    """
+
+    def __init__(self, timeout=TIMEOUT, reintentos=REINTENTOS, interruptor=None):
+        self.timeout = timeout
+        self.reintentos = reintentos
+        self.interruptor = interruptor or InterruptorCircuito()
+        self.ctx = ssl.create_default_context()
+        self.ctx.check_hostname = False
+        self.ctx.verify_mode = ssl.CERT_NONE
+        self.latencias = deque(maxlen=200)
+        self.lock = threading.Lock()
+        self.contadores = {
+            'consultas': 0,     # Llamadas a descargar()
+            'exitos': 0,
+            'fallos': 0,        # Consultas que agotaron los reintentos
+            'rechazadas': 0,    # Consultas no intentadas por el circuito abierto
+            'peticiones': 0,    # Peticiones HTTP, incluidas coberturas y reintentos
+            'reintentos': 0,
+            'coberturas': 0,
+        }
+        self.ultimo_error = None
+        # Las peticiones abandonadas por una cobertura terminan solas al vencer su timeout
+        self.pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='siiau')
+
+    def descargar(self, url, presupuesto=PRESUPUESTO, procesar=None):
+        """
+        Retorna el cuerpo de url, o procesar(cuerpo) si se pasa procesar. Lanza
+        CircuitoAbierto sin consultar si el circuito está abierto, o ErrorSIIAU
+        si se agotaron los reintentos o el presupuesto de tiempo.
+
+        La consulta solo cuenta como éxito para el interruptor si procesar no
+        lanza una excepción: una página de mantenimiento que responde 200 sin
+        materias es un fallo (y no se reintenta).
+        """
+        self.contadores['consultas'] += 1
+        if not self.interruptor.permite():
+            self.contadores['rechazadas'] += 1
+            raise CircuitoAbierto(f"circuito abierto, reintento en {self.interruptor.segundos_restantes():.0f} s")
+        fin = time.monotonic() + presupuesto
+        error = None
+        for intento in range(self.reintentos + 1):
+            restante = fin - time.monotonic()
+            if restante <= 0:
+                break
+            if intento:
+                self.contadores['reintentos'] += 1
+            try:
+                cuerpo = self._con_cobertura(url, min(self.timeout, restante))
+            except Exception as e:
+                error = e
+                logger.warning(f"Petición a SIIAU fallida (intento {intento + 1}): {e}")
+            else:
+                try:
+                    resultado = procesar(cuerpo) if procesar is not None else cuerpo
+                except Exception as e:
+                    error = e
+                    logger.warning(f"Respuesta de SIIAU inválida: {e}")
+                    break
+                self.contadores['exitos'] += 1
+                self.interruptor.exito()
+                return resultado
+            espera = random.uniform(0, min(ESPERA_MAXIMA, ESPERA_BASE * 2 ** intento))
+            if intento == self.reintentos or time.monotonic() + espera >= fin:
+                break
+            time.sleep(espera)
+        self.contadores['fallos'] += 1
+        self.ultimo_error = str(error) if error else "presupuesto agotado"
+        self.interruptor.fallo()
+        raise ErrorSIIAU(self.ultimo_error) from error
+
+    def retraso_cobertura(self):
+        """Segundos a esperar antes de lanzar una petición de cobertura, o None si aún no hay muestras"""
+        if len(self.latencias) < MIN_MUESTRAS:
+            return None
+        return max(RETRASO_MINIMO, percentil(list(self.latencias), PERCENTIL_COBERTURA))
+
+    def _con_cobertura(self, url, timeout):
+        """Una petición y, si tarda más que el percentil de cobertura, una segunda; gana la primera en responder"""
+        limite = time.monotonic() + timeout
+        pendientes = {self.pool.submit(self._obtener, url, timeout)}
+        retraso = self.retraso_cobertura()
+        if retraso is not None and retraso < timeout:
+            hechos, _ = wait(pendientes, timeout=retraso)
+            if not hechos:
+                self.contadores['coberturas'] += 1
+                pendientes.add(self.pool.submit(self._obtener, url, timeout - retraso))
+        error = None
+        while pendientes:
+            hechos, pendientes = wait(pendientes, timeout=max(0, limite - time.monotonic()),
+                                      return_when=FIRST_COMPLETED)
+            if not hechos:
+                raise TimeoutError(f"sin respuesta en {timeout:.1f} s")
+            for futuro in hechos:
+                if futuro.exception() is None:
+                    return futuro.result()
+                error = futuro.exception()
+        raise error
+
+    def _obtener(self, url, timeout):
+        with self.lock:
+            self.contadores['peticiones'] += 1
+        inicio = time.monotonic()
+        cuerpo = request.urlopen(url, context=self.ctx, timeout=timeout).read()
+        self.latencias.append(time.monotonic() - inicio)
+        return cuerpo
+
+    def metricas(self):
+        latencias = list(self.latencias)
+        return {
+            'circuito': self.interruptor.estado,
+            'fallos_consecutivos': self.interruptor.fallos_consecutivos,
+            'aperturas': self.interruptor.aperturas,
+            'reintento_en_s': round(self.interruptor.segundos_restantes(), 1),
+            **self.contadores,
+            'latencia_p50_s': percentil(latencias, 0.5),
+            'latencia_p90_s': percentil(latencias, 0.9),
+            'latencia_p99_s': percentil(latencias, 0.99),
+            'ultimo_error': self.ultimo_error,
+        }
@@ -0,0 +1,175 @@
+"""
+Motor de conflictos de horario basado en máscaras de bits.
+
+Cada sección se codifica como una máscara de 192 bits: 6 días (L M I J V S)
+x 32 ranuras de 30 minutos entre las 06:00 y las 22:00. Cada día ocupa 32 bits,
+así que la máscara completa cabe en 3 palabras uint64 y los choques entre
+secciones se revisan con operaciones AND vectorizadas de NumPy.
+"""
+import time
+
+import numpy as np
+
+DIAS = "LMIJVS"           # Lunes, Martes, mIércoles, Jueves, Viernes, Sábado
+HORA_INICIO = 6 * 60      # 06:00 en minutos
+MINUTOS_RANURA = 30
+RANURAS_DIA = 32          # 06:00 - 22:00
+PALABRAS = 3              # 6 días x 32 bits = 192 bits = 3 x uint64
+
+MAX_RESULTADOS = 5        # Combinaciones que se muestran al usuario
+MAX_BUSQUEDA = 200        # Combinaciones que se cuentan antes de cortar la búsqueda
+TIEMPO_BUSQUEDA = 0.5     # Segundos máximos de búsqueda
+
+
+def _minutos(hhmm):
+    """Convierte '0700' en minutos desde la medianoche"""
+    hhmm = hhmm.strip()
+    return int(hhmm[:-2]) * 60 + int(hhmm[-2:])
+
+
+def mascara_sesion(hora, dias):
+    """
+    Retorna la máscara (3 x uint64) de una sesión con hora '0700-0855'
+    y días como 'L . I . . .', o None si no se puede interpretar.
+    """
+    try:
+        inicio, fin = hora.split('-')
+        inicio, fin = _minutos(inicio), _minutos(fin)
+    except (ValueError, AttributeError):
+        return None
+    primera = max(0, (inicio - HORA_INICIO) // MINUTOS_RANURA)
+    # La hora final es inclusiva en SIIAU (0855), se redondea hacia arriba
+    ultima = min(RANURAS_DIA, -(-(fin - HORA_INICIO) // MINUTOS_RANURA))
+    if ultima <= primera:
+        return None
+    bits_dia = ((1 << (ultima - primera)) - 1) << primera
+    total = 0
+    for letra in str(dias).upper():
+        d = DIAS.find(letra)
+        if d >= 0:
+            total |= bits_dia << (d * RANURAS_DIA)
+    if not total:
+        return None
+    return np.array([(total >> (64 * i)) & 0xFFFFFFFFFFFFFFFF for i in range(PALABRAS)], dtype=np.uint64)
+
+
+def mascara_clase(clase):
+    """Combina las máscaras de todas las sesiones de una clase"""
+    mascara = np.zeros(PALABRAS, dtype=np.uint64)
+    for sesion in clase.getSesiones():
+        if len(sesion) > 2:
+            m = mascara_sesion(sesion[1], sesion[2])
+            if m is not None:
+                mascara |= m
+    return mascara
+
+
+def describir_horario(clase):
+    """Texto corto con días y horas de una clase: 'LI 0700-0855'"""
+    partes = []
+    for sesion in clase.getSesiones():
+        if len(sesion) > 2:
+            dias = "".join(c for c in str(sesion[2]).upper() if c in DIAS)
+            partes.append(f"{dias} {sesion[1]}")
+    return ", ".join(partes) if partes else "Sin horario"
+
+
+class MotorHorario:
+    """
+    Cache de máscaras por NRC y buscador de combinaciones sin conflictos.
+    Las máscaras se recalculan solo cuando cambia la versión del NRC.
+    """
+
+    def __init__(self):
+        self.mascaras = {}  # {nrc: (version, mascara)}
+
+    def mascara(self, clase, version):
+        nrc = clase.getNRC()
+        entrada = self.mascaras.get(nrc)
+        if entrada is None or entrada[0] != version:
+            entrada = (version, mascara_clase(clase))
+            self.mascaras[nrc] = entrada
+        return entrada[1]
+
+    def invalidar(self, nrcs):
+        for nrc in nrcs:
+            self.mascaras.pop(nrc, None)
+
+    def agrupar(self, secciones, versiones):
+        """
+        Agrupa las secciones de una clave por máscara idéntica. Las secciones con
+        el mismo horario son intercambiables, así que la búsqueda solo ramifica
+        sobre grupos. Retorna (matriz de máscaras únicas, lista de secciones por grupo).
+        """
+        matriz = np.stack([self.mascara(c, versiones.get(c.getNRC())) for c in secciones])
+        unicas, inverso = np.unique(matriz, axis=0, return_inverse=True)
+        grupos = [[] for _ in range(len(unicas))]
+        for clase, g in zip(secciones, np.ravel(inverso)):
+            grupos[g].append(clase)
+        for grupo in grupos:
+            grupo.sort(key=lambda c: -c.cupos_disponibles())
+        return unicas, grupos
+
+    def combinaciones(self, secciones_por_clave, versiones, limite=MAX_BUSQUEDA, tiempo_maximo=TIEMPO_BUSQUEDA):
+        """
+        Enumera combinaciones sin conflictos con una sección (grupo) por clave.
+
+        Args:
+            secciones_por_clave: {clave: [Clase, ...]}
+            versiones: {nrc: version} para reutilizar las máscaras en cache
+
+        Returns:
+            (lista de combinaciones [{clave: [Clase, ...]}], completo) donde
+            completo es False si la búsqueda se cortó por límite o tiempo.
+        """
+        fin = time.perf_counter() + tiempo_maximo
+        claves = []
+        for clave, secciones in secciones_por_clave.items():
+            if secciones:
+                unicas, grupos = self.agrupar(secciones, versiones)
+                claves.append((clave, unicas, grupos))
+        # Ramificar primero por las claves con menos opciones
+        claves.sort(key=lambda c: len(c[2]))
+
+        resultados = []
+        elegidos = []
+        estado = {'completo': True}
+
+        def viables(acumulada, desde):
+            """Revisa que cada clave restante tenga al menos un grupo compatible"""
+            for _, unicas, _ in claves[desde:]:
+                if not np.any(~np.any(unicas & acumulada, axis=1)):
+                    return False
+            return True
+
+        def buscar(i, acumulada):
+            if len(resultados) >= limite or time.perf_counter() > fin:
+                estado['completo'] = False
+                return
+            if i == len(claves):
+                resultados.append({claves[k][0]: claves[k][2][g] for k, g in enumerate(elegidos)})
+                return
+            _, unicas, _ = claves[i]
+            compatibles = np.flatnonzero(~np.any(unicas & acumulada, axis=1))
+            for g in compatibles:
+                nueva = acumulada | unicas[g]
+                if not viables(nueva, i + 1):
+                    continue
+                elegidos.append(g)
+                buscar(i + 1, nueva)
+                elegidos.pop()
+                if not estado['completo']:
+                    return
+
+        if claves:
+            buscar(0, np.zeros(PALABRAS, dtype=np.uint64))
+        return resultados, estado['completo']
+
+
+def contar_horarios(combinacion):
+    """Número de horarios concretos (por NRC) que representa una combinación de grupos"""
+    total = 1
+    for secciones in combinacion.values():
+        total *= len(secciones)
+    return total
+
@@ -0,0 +1,291 @@
+"""
+Modo distribuido: reparte a los usuarios entre N procesos (workers) del bot.
+
+- Cada usuario pertenece a un solo worker, elegido con hashing consistente de
+  su user_id (AnilloConsistente).
+- Un solo worker consulta SIIAU: el que tiene el lease en el almacén compartido
+  (una fila de SQLite con vencimiento). Si ese worker muere, otro toma el lease
+  cuando vence.
+- El líder publica el diff de cada snapshot en el almacén; todos los workers lo
+  aplican a su copia local y solo notifican a los usuarios de su fragmento.
+- Solo el worker frontal hace polling a Telegram. Los mensajes de usuarios de
+  otros fragmentos se reenvían por el almacén y los procesa su dueño.
+
+Prueba local con varios procesos, SIIAU falso y una Bot API falsa:
+    python sharding.py --workers 3 --usuarios 60 --segundos 40
+"""
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+MAX_VERSIONES = 500  # Diffs que se conservan en el almacén para ponerse al día
+MARGEN_LEASE = 10    # Segundos que el lease dura de más sobre el presupuesto de una consulta a SIIAU
+
+
+def _hash(texto):
+    return int.from_bytes(hashlib.md5(str(texto).encode()).digest()[:8], 'big')
+
+
+class AnilloConsistente:
+    """Hashing consistente con nodos virtuales: agregar un worker solo mueve ~1/N usuarios"""
+
+    def __init__(self, n_workers, replicas=64):
+        puntos = sorted((_hash(f"worker-{w}#{r}"), w) for w in range(n_workers) for r in range(replicas))
+        self.hashes = [h for h, _ in puntos]
+        self.workers = [w for _, w in puntos]
+
+    def worker_de(self, user_id):
+        i = bisect.bisect(self.hashes, _hash(user_id)) % len(self.hashes)
+        return self.workers[i]
+
+
+class AlmacenCompartido:
+    """
+    Almacén SQLite compartido por los workers de una misma máquina.
+
+    Tablas:
+        lease: una fila con el worker que consulta SIIAU y su vencimiento
+        snapshots: diffs publicados {nrc: datos o null} por versión
+        catalogo: última oferta completa, para workers que arrancan o se atrasan
+        operaciones: updates de Telegram reenviados al worker dueño del usuario
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.conexion = sqlite3.connect(ruta, timeout=30, isolation_level=None)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.executescript("""
+            CREATE TABLE IF NOT EXISTS lease (id INTEGER PRIMARY KEY CHECK (id = 1), worker INTEGER, expira REAL);
+            CREATE TABLE IF NOT EXISTS snapshots (version INTEGER PRIMARY KEY, creado REAL, cambios TEXT);
+            CREATE TABLE IF NOT EXISTS catalogo (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER, datos TEXT);
+            CREATE TABLE IF NOT EXISTS operaciones (id INTEGER PRIMARY KEY AUTOINCREMENT, worker INTEGER, update_json TEXT);
+        """)
+
+    def tomar_lease(self, worker_id, ttl):
+        """Renueva o toma el lease si está libre o vencido. Retorna True si worker_id es el líder"""
+        ahora = time.time()
+        with self._transaccion():
+            self.conexion.execute("INSERT OR IGNORE INTO lease (id, worker, expira) VALUES (1, ?, 0)", (worker_id,))
+            self.conexion.execute(
+                "UPDATE lease SET worker = ?, expira = ? WHERE id = 1 AND (worker = ? OR expira < ?)",
+                (worker_id, ahora + ttl, worker_id, ahora)
+            )
+            fila = self.conexion.execute("SELECT worker FROM lease WHERE id = 1").fetchone()
+        return fila[0] == worker_id
+
+    def publicar(self, cambios, filas, worker_id, ttl):
+        """
+        Guarda un diff y la oferta completa y renueva el lease; retorna la nueva
+        versión. Retorna None sin publicar si worker_id ya no tiene un lease
+        vigente (venció durante la consulta y otro worker pudo tomarlo).
+        """
+        ahora = time.time()
+        with self._transaccion():
+            vigente = self.conexion.execute(
+                "SELECT 1 FROM lease WHERE id = 1 AND worker = ? AND expira > ?", (worker_id, ahora)
+            ).fetchone()
+            if vigente is None:
+                return None
+            self.conexion.execute("UPDATE lease SET expira = ? WHERE id = 1", (ahora + ttl,))
+            version = self.conexion.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM snapshots").fetchone()[0]
+            self.conexion.execute("INSERT INTO snapshots VALUES (?, ?, ?)", (version, time.time(), json.dumps(cambios)))
+            self.conexion.execute("INSERT OR REPLACE INTO catalogo VALUES (1, ?, ?)", (version, json.dumps(filas)))
+            self.conexion.execute("DELETE FROM snapshots WHERE version <= ?", (version - MAX_VERSIONES,))
+        return version
+
+    def cambios_desde(self, version):
+        """
+        Diffs posteriores a version como [(version, {nrc: datos o None})].
+        Retorna None si ya no están todos y hay que cargar el catálogo completo.
+        """
+        minima = self.conexion.execute("SELECT MIN(version) FROM snapshots").fetchone()[0]
+        if minima is None:
+            return []
+        if minima > version + 1:
+            return None
+        filas = self.conexion.execute(
+            "SELECT version, cambios FROM snapshots WHERE version > ? ORDER BY version", (version,)
+        ).fetchall()
+        return [(v, json.loads(c)) for v, c in filas]
+
+    def catalogo(self):
+        fila = self.conexion.execute("SELECT version, datos FROM catalogo WHERE id = 1").fetchone()
+        if fila is None:
+            return 0, None
+        return fila[0], json.loads(fila[1])
+
+    def encolar(self, worker_id, update_json):
+        self.conexion.execute("INSERT INTO operaciones (worker, update_json) VALUES (?, ?)", (worker_id, update_json))
+
+    def tomar_operaciones(self, worker_id):
+        """Retira y retorna los updates reenviados a worker_id, en orden de llegada"""
+        with self._transaccion():
+            filas = self.conexion.execute(
+                "SELECT id, update_json FROM operaciones WHERE worker = ? ORDER BY id", (worker_id,)
+            ).fetchall()
+            if filas:
+                self.conexion.execute("DELETE FROM operaciones WHERE worker = ? AND id <= ?", (worker_id, filas[-1][0]))
+        return [json.loads(u) for _, u in filas]
+
+    def _transaccion(self):
+        conexion = self.conexion
+
+        class Transaccion:
+            def __enter__(self):
+                conexion.execute("BEGIN IMMEDIATE")
+
+            def __exit__(self, tipo, valor, traza):
+                conexion.execute("COMMIT" if tipo is None else "ROLLBACK")
+
+        return Transaccion()
+
+
+class Fragmento:
+    """
+    Configuración y estado de un worker en modo distribuido.
+
+    Atributos:
+        worker_id: Índice de este worker (0..n_workers-1)
+        frontal: Si este worker hace polling a Telegram
+        version_aplicada: Última versión del almacén aplicada al monitor local
+    """
+
+    def __init__(self, worker_id, n_workers, ruta_almacen, frontal=None, ttl=30):
+        self.worker_id = worker_id
+        self.n_workers = n_workers
+        self.frontal = (worker_id == 0) if frontal is None else frontal
+        self.ttl = ttl
+        self.anillo = AnilloConsistente(n_workers)
+        self.almacen = AlmacenCompartido(ruta_almacen)
+        self.version_aplicada = 0
+        self.es_lider = False
+
+    def es_propio(self, user_id):
+        return self.anillo.worker_de(user_id) == self.worker_id
+
+    async def sincronizar(self, monitor, construir, sondear=False):
+        """
+        Aplica al monitor los diffs publicados y, si sondear es True y este
+        worker tiene el lease, consulta SIIAU y publica el nuevo diff. La
+        consulta a SIIAU corre fuera del event loop (monitor.obtener_datos_siiau);
+        el almacén se usa desde el loop.
+
+        Args:
+            monitor: SiiauMonitor local
+            construir: función filas -> {nrc: Clase}
+        """
+        cambios = self.almacen.cambios_desde(self.version_aplicada)
+        if cambios is None or (self.version_aplicada == 0 and cambios):
+            version, filas = self.almacen.catalogo()
+            if filas is not None:
+                monitor.aplicar_snapshot(construir(filas))
+                self.version_aplicada = version
+        elif cambios:
+            materias = dict(monitor.materias_cache)
+            for _, diff in cambios:
+                nuevas = construir([d for d in diff.values() if d is not None])
+                for nrc, datos in diff.items():
+                    if datos is None:
+                        materias.pop(nrc, None)
+                    elif nrc in nuevas:
+                        materias[nrc] = nuevas[nrc]
+            monitor.aplicar_snapshot(materias)
+            self.version_aplicada = cambios[-1][0]
+
+        if sondear:
+            self.es_lider = self.almacen.tomar_lease(self.worker_id, self.ttl)
+            if self.es_lider and await monitor.obtener_datos_siiau() and monitor.diff:
+                cambios = {nrc: (clase.datos if clase is not None else None)
+                           for nrc, (_, clase) in monitor.diff.items()}
+                filas = [clase.datos for clase in monitor.materias_cache.values()]
+                version = self.almacen.publicar(cambios, filas, self.worker_id, self.ttl)
+                if version is None:
+                    # Perdió el lease: el snapshot local no es el publicado y en
+                    # la siguiente sincronización se recarga el catálogo completo
+                    self.es_lider = False
+                    self.version_aplicada = 0
+                else:
+                    self.version_aplicada = version
+        return monitor.materias_cache
+
+
+def prueba_local(n_workers, usuarios, segundos, intervalo):
+    """
+    Levanta SIIAU y Telegram falsos, lanza n_workers procesos del bot, suscribe
+    usuarios por medio de comandos y verifica que cada notificación la envió
+    el worker dueño del usuario y que SIIAU solo se consultó desde un worker.
+    """
+    from fake_services import ServidorSIIAUFalso, ServidorTelegramFalso
+
+    siiau = ServidorSIIAUFalso(secciones=300, cambios=0.05).iniciar()
+    telegram = ServidorTelegramFalso().iniciar()
+    directorio = tempfile.mkdtemp(prefix="siiaubot-shards-")
+    with open(os.path.join(directorio, 'token.txt'), 'w') as f:
+        f.write("123456:PRUEBA")
+    almacen = os.path.join(directorio, 'almacen.sqlite')
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'siiau_monitor_bot.py')
+
+    procesos = []
+    for k in range(n_workers):
+        procesos.append(subprocess.Popen([
+            sys.executable, script,
+            '--workers', str(n_workers), '--worker', str(k), '--almacen', almacen,
+            '--intervalo', str(intervalo),
+            '--telegram-api', f"{telegram.url}/w{k}/bot",
+            '--siiau-url', siiau.url + "/oferta?ciclop={ciclo}",
+        ], cwd=directorio, stdout=subprocess.DEVNULL, stderr=open(os.path.join(directorio, f'worker{k}.log'), 'w')))
+
+    try:
+        time.sleep(intervalo * 2 + 3)
+        nrcs = [f['nrc'] for f in siiau.filas]
+        for u in range(usuarios):
+            telegram.encolar_comando(1000 + u, f"/suscribir {nrcs[u % len(nrcs)]}")
+        time.sleep(segundos)
+    finally:
+        for p in procesos:
+            p.terminate()
+        for p in procesos:
+            try:
+                p.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+        siiau.detener()
+        telegram.detener()
+
+    anillo = AnilloConsistente(n_workers)
+    por_worker = {k: 0 for k in range(n_workers)}
+    ajenos = 0
+    usuarios_atendidos = set()
+    for m in telegram.enviados:
+        if not m['chat_id'].isdigit() or int(m['chat_id']) < 1000:
+            continue
+        por_worker[m['worker']] = por_worker.get(m['worker'], 0) + 1
+        usuarios_atendidos.add(m['chat_id'])
+        if anillo.worker_de(m['chat_id']) != m['worker']:
+            ajenos += 1
+    ciclos = segundos / intervalo
+    print(f"Directorio de la prueba: {directorio}")
+    print(f"Mensajes por worker: {por_worker}")
+    print(f"Usuarios atendidos: {len(usuarios_atendidos)}/{usuarios}")
+    print(f"Mensajes enviados por un worker ajeno: {ajenos}")
+    print(f"Consultas a SIIAU: {siiau.peticiones} (~{ciclos:.0f} ciclos de monitoreo)")
+    ok = ajenos == 0 and len(usuarios_atendidos) == usuarios and siiau.peticiones <= ciclos * 1.5 + 3
+    print("OK" if ok else "FALLO")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Prueba local del modo distribuido")
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--usuarios', type=int, default=60)
+    parser.add_argument('--segundos', type=float, default=30)
+    parser.add_argument('--intervalo', type=float, default=2)
+    args = parser.parse_args()
+    sys.exit(prueba_local(args.workers, args.usuarios, args.segundos, args.intervalo))
@@ -1,15 +1,21 @@
 import logging
 import asyncio
+import argparse
 import json
 import os
 from datetime import datetime, timedelta
 from typing import Dict, List, Set
 import tempfile
+import zlib
+from collections import OrderedDict
 from html.parser import HTMLParser
-from urllib import request
-import ssl
-from telegram import Update
-from telegram.ext import ApplicationBuilder, ContextTypes, CommandHandler, MessageHandler, filters
+from telegram import Update, InlineQueryResultArticle, InputTextMessageContent
+from telegram.ext import (ApplicationBuilder, ApplicationHandlerStop, ContextTypes, CommandHandler,
+                          InlineQueryHandler, MessageHandler, TypeHandler, filters)
+from database import MALLA
+from schedule import MotorHorario, describir_horario, contar_horarios, MAX_RESULTADOS
+from fuzzy import IndiceDifuso, normalizar, distancia, formatear_sugerencias
+from resilience import ClienteSIIAU, CircuitoAbierto, ErrorSIIAU, PRESUPUESTO, PRESUPUESTO_COMANDO
 
 # Configuración de logging
 logging.basicConfig(
@@ -134,6 +140,11 @@ class Clase:
         if len(self.datos) > 8 and isinstance(self.datos[8], list) and len(self.datos[8]) > 0:
             return self.datos[8][0] if isinstance(self.datos[8][0], list) else str(self.datos[8][0])
         return "No definido"
+    def getSesiones(self):
+        """Retorna todas las sesiones de horario [Ses, Hora, Dias, Edif, Aula, Periodo]"""
+        if len(self.datos) > 8 and isinstance(self.datos[8], list):
+            return [s for s in self.datos[8] if isinstance(s, list)]
+        return []
     
     # Métodos adicionales para compatibilidad con el monitoreo
     def tiene_cupos(self):
@@ -178,6 +189,29 @@ class Clase:
                 f"👥 Cupos: {self.cupos_disponibles()}/{self.cupos_totales()}\n"
                 f"👨‍🏫 Profesor: {self.getProfesor()}\n"
                 f"🕐 Horario: {self.getHorarios()}")
+
+    def info_listado(self):
+        """Retorna la entrada usada en listados (/buscar, /mis_suscripciones)"""
+        status = "✅" if self.tiene_cupos() else "❌"
+        return (f"• {status} *{self.getNombre()}*\n"
+                f"  🔢 NRC: `{self.getNRC()}`\n"
+                f"  📝 Clave: `{self.getClave()}`\n"
+                f"  👥 Cupos: {self.cupos_disponibles()}/{self.cupos_totales()}\n"
+                f"  👨‍🏫 Profesor: {self.getProfesor()}\n"
+                f"  🕐 Horario: {self.getHorarios()}\n\n")
+
+    def info_resumen(self):
+        """Retorna la entrada usada en el resumen periódico"""
+        status = "✅ Disponible" if self.tiene_cupos() else "❌ Sin cupos"
+        return (f"• *{self.getNombre()}*\n"
+                f"  NRC: `{self.getNRC()}` | {status}\n"
+                f"  Cupos: {self.cupos_disponibles()}/{self.cupos_totales()}\n"
+                f"  Profesor: {self.getProfesor()}\n\n")
+
+    def info_alerta(self):
+        """Retorna el mensaje de alerta de cupos"""
+        return (f"🎉 *¡ALERTA DE CUPOS!*\n\n{self.info_cupos()}\n\n"
+                f"¡Date prisa para inscribirte! 🏃‍♂️💨")
     
     def __str__(self):
         return str(self.datos)
@@ -185,33 +219,47 @@ class Clase:
     def isClave(code):
         return type(code)==str and code[0]=='I'
 
+# URL de la oferta de SIIAU; se puede reemplazar (p. ej. por un servidor local de pruebas)
+SIIAU_URL = "https://siiauescolar.siiau.udg.mx/wal/sspseca.consulta_oferta?ciclop={ciclo}&cup=&majrp=ICOM&mostrarp=1000000"
+
 # BaseDatos adaptada para usar el URL fijo y lógica Limabot
 class BaseDatos:
-    def __init__(self, ciclo = "202520"):
-        ctx = ssl.create_default_context()
-        ctx.check_hostname = False
-        ctx.verify_mode = ssl.CERT_NONE
-        url = "https://siiauescolar.siiau.udg.mx/wal/sspseca.consulta_oferta?ciclop=" + ciclo + "&cup=&majrp=ICOM&mostrarp=1000000"
+    def __init__(self, ciclo = "202520", datos = None, cliente = None, presupuesto = PRESUPUESTO):
+        """
+        Descarga y procesa la oferta del ciclo. Si se pasan datos (filas ya
+        extraídas de SIIAU), se construyen las clases sin descargar nada.
+        La descarga pasa por cliente (ClienteSIIAU) para compartir reintentos
+        e interruptor entre consultas. Bloquea: desde el event loop se
+        construye en un hilo.
+        """
+        if datos is not None:
+            self.cargar_datos(datos)
+            return
+        url = SIIAU_URL.format(ciclo=ciclo)
         try:
-            body = request.urlopen(url, context=ctx).read()
+            (cliente or ClienteSIIAU()).descargar(url, presupuesto, procesar=self.procesar)
+        except CircuitoAbierto as e:
+            logging.warning(f"SIIAU no disponible: {e}")
+            self.cargar_datos([])
         except Exception as e:
             logging.error(f"No se pudo obtener la página SIIAU: {e}")
-            self.Datos = []
-            self.NRCDict = {}
-            self.ClaveDict = {}
-            self.Clases = []
-            return
+            self.cargar_datos([])
+    def procesar(self, body):
+        """
+        Extrae las materias de la página. Lanza ErrorSIIAU si no hay ninguna
+        para que la descarga no cuente como éxito (p. ej. página de mantenimiento).
+        """
         Datos = []
         parser = ParserUDG()
         parser.feed_datos(str(body), Datos)
         if not Datos or not isinstance(Datos, list) or len(Datos) == 0 or not isinstance(Datos[0], list):
-            logging.warning("No se pudieron extraer materias de SIIAU: formato inesperado")
-            self.Datos = []
-            self.NRCDict = {}
-            self.ClaveDict = {}
-            self.Clases = []
-            return
-        self.Datos = Datos[0]
+            raise ErrorSIIAU("no se pudieron extraer materias: formato inesperado")
+        self.cargar_datos(Datos[0])
+        if not self.NRCDict:
+            raise ErrorSIIAU("la página no tiene materias")
+    def cargar_datos(self, datos):
+        """Construye NRCDict, ClaveDict y Clases a partir de las filas de SIIAU"""
+        self.Datos = datos
         self.NRCDict = {}
         self.ClaveDict = {}
         self.Clases = []
@@ -247,35 +295,362 @@ def ActualizarBases():
     Calendarios = ["202520"]
     Ciclo["202520"] = BaseDatos("202520")
 
+class CacheRender:
+    """
+    Cache de mensajes Markdown ya formateados por materia.
+
+    Las entradas se indexan por (NRC, versión, plantilla), donde la versión es
+    la del último snapshot en el que cambiaron los datos de ese NRC. Así, un
+    mismo texto se reutiliza para todos los suscriptores y todos los ticks
+    hasta que la materia cambia.
+    """
+    # Plantilla -> método de Clase que la genera
+    PLANTILLAS = {
+        'info': Clase.info_cupos,
+        'listado': Clase.info_listado,
+        'resumen': Clase.info_resumen,
+        'alerta': Clase.info_alerta,
+    }
+
+    def __init__(self):
+        self.entradas = {}  # {nrc: (version, {plantilla: texto})}
+        self.aciertos = 0
+        self.fallos = 0
+
+    def render(self, materia, version, plantilla):
+        """Retorna el texto de la plantilla, generándolo solo si no está en cache"""
+        nrc = materia.getNRC()
+        entrada = self.entradas.get(nrc)
+        if entrada is None or entrada[0] != version:
+            entrada = (version, {})
+            self.entradas[nrc] = entrada
+        textos = entrada[1]
+        texto = textos.get(plantilla)
+        if texto is None:
+            self.fallos += 1
+            texto = CacheRender.PLANTILLAS[plantilla](materia)
+            textos[plantilla] = texto
+        else:
+            self.aciertos += 1
+        return texto
+
+    def invalidar(self, nrcs):
+        """Descarta las entradas de los NRCs cuyos datos cambiaron"""
+        for nrc in nrcs:
+            self.entradas.pop(nrc, None)
+
+class CacheConsultas:
+    """
+    LRU acotado de resultados de búsqueda por (consulta normalizada, versión).
+
+    Los resultados son NRCs y solo dependen de nombres, claves y NRCs, así que
+    la versión es version_estructura: un cambio de cupos no invalida nada.
+    Todo el contenido se descarta cuando cambia esa versión. Si una
+    consulta no está en cache se filtra el resultado de su prefijo más largo
+    que sí esté (lo que contiene 'alge' también contiene 'alg'), así que cada
+    tecla del modo inline solo revisa los resultados de la tecla anterior.
+    """
+    def __init__(self, capacidad=512):
+        self.capacidad = capacidad
+        self.version = None
+        self.entradas = OrderedDict()  # {consulta: [(texto, nrc)]}
+        self.aciertos = 0
+        self.fallos = 0
+
+    def buscar(self, consulta, version, catalogo):
+        """
+        Args:
+            consulta: Texto ya normalizado
+            version: Versión de estructura del snapshot actual
+            catalogo: Función que retorna [(texto normalizado, nrc)] del snapshot
+        """
+        if version != self.version:
+            self.entradas.clear()
+            self.version = version
+        resultado = self.entradas.get(consulta)
+        if resultado is not None:
+            self.entradas.move_to_end(consulta)
+            self.aciertos += 1
+            return resultado
+        self.fallos += 1
+        base = None
+        for i in range(len(consulta) - 1, 0, -1):
+            base = self.entradas.get(consulta[:i])
+            if base is not None:
+                break
+        if base is None:
+            base = catalogo()
+        resultado = [(texto, nrc) for texto, nrc in base if consulta in texto]
+        self.entradas[consulta] = resultado
+        if len(self.entradas) > self.capacidad:
+            self.entradas.popitem(last=False)
+        return resultado
+
+class AgregadosMalla:
+    """
+    Totales de cupos por clave y por semestre de la malla.
+
+    Se actualizan con cada diff del snapshot restando la contribución anterior
+    de cada NRC modificado y sumando la nueva, sin recorrer toda la oferta.
+
+    Atributos:
+        por_clave: {clave: totales} de las claves con al menos una sección
+        por_semestre: {semestre: totales + 'claves_abiertas': set de claves con cupos}
+        semestres_de: {clave: [semestres de la malla que la incluyen]}
+    """
+    def __init__(self, malla):
+        self.malla = {semestre: list(dict.fromkeys(claves)) for semestre, claves in malla.items()}
+        self.semestres_de = {}
+        for semestre, claves in self.malla.items():
+            for clave in claves:
+                self.semestres_de.setdefault(clave, []).append(semestre)
+        self.por_clave = {}
+        self.por_semestre = {semestre: AgregadosMalla.totales_vacios() for semestre in list(self.malla) + ['todo']}
+        for totales in self.por_semestre.values():
+            totales['claves_abiertas'] = set()
+
+    @staticmethod
+    def totales_vacios():
+        return {'cupos': 0, 'disponibles': 0, 'secciones': 0, 'abiertas': 0}
+
+    def aplicar(self, diff, inicial=False):
+        """Oyente del monitor: aplica un diff {nrc: (clase_anterior, clase_nueva)}"""
+        for previa, clase in diff.values():
+            if previa is not None:
+                self.sumar(previa, -1)
+            if clase is not None:
+                self.sumar(clase, 1)
+
+    def sumar(self, clase, signo):
+        clave = clase.getClave()
+        totales = self.por_clave.setdefault(clave, AgregadosMalla.totales_vacios())
+        abierta_antes = totales['abiertas'] > 0
+        delta = {
+            'cupos': signo * clase.cupos_totales(),
+            'disponibles': signo * clase.cupos_disponibles(),
+            'secciones': signo,
+            'abiertas': signo if clase.tiene_cupos() else 0,
+        }
+        for campo, valor in delta.items():
+            totales[campo] += valor
+        if totales['secciones'] == 0:
+            # La clave salió de la oferta: no cuenta en claves('todo')
+            del self.por_clave[clave]
+        abierta_despues = totales['abiertas'] > 0
+        for semestre in self.semestres_de.get(clave, []) + ['todo']:
+            agregado = self.por_semestre[semestre]
+            for campo, valor in delta.items():
+                agregado[campo] += valor
+            if abierta_despues and not abierta_antes:
+                agregado['claves_abiertas'].add(clave)
+            elif abierta_antes and not abierta_despues:
+                agregado['claves_abiertas'].discard(clave)
+
+    def claves(self, semestre):
+        """Claves del semestre ('todo' = todas las claves de la oferta)"""
+        if semestre == 'todo':
+            return list(self.por_clave)
+        return self.malla.get(semestre, [])
+
+    @staticmethod
+    def ocupacion(totales):
+        if totales['cupos'] > 0:
+            return (totales['cupos'] - totales['disponibles']) / totales['cupos'] * 100
+        return 0
+
 class SiiauMonitor:
     """
     Clase principal para monitorear SIIAU.
     Se encarga de obtener y mantener actualizados los datos de las materias.
     
     Atributos:
-        ctx: Contexto SSL para las conexiones HTTPS
+        cliente: ClienteSIIAU con reintentos, cobertura e interruptor
         materias_cache: Diccionario que almacena las materias por NRC
+        ultima_actualizacion: Momento de la última consulta exitosa a SIIAU
+        desactualizado: True si la última consulta falló y se sirve el snapshot anterior
+        claves_cache: Materias del snapshot agrupadas {clave: {nrc: Clase}}
+        version: Versión del snapshot, se incrementa cuando algún NRC cambia
+        version_estructura: Se incrementa solo si cambian NRCs, claves o nombres (no cupos)
+        versiones_nrc: Versión del snapshot en la que cambió cada NRC por última vez
+        diff: Cambios del último snapshot {nrc: (clase_anterior, clase_nueva)}
+        render_cache: Cache de mensajes formateados por NRC
+        oyentes: Funciones llamadas con (diff, inicial) cada vez que cambia el snapshot
+        agregados: Totales de cupos por clave y semestre, actualizados con cada diff
+        consulta_en_curso: asyncio.Future de la descarga en curso, compartida por quien la pida
     """
     
     def __init__(self):
-        # Configuración del contexto SSL para permitir conexiones a SIIAU
-        self.ctx = ssl.create_default_context()
-        self.ctx.check_hostname = False
-        self.ctx.verify_mode = ssl.CERT_NONE
+        self.cliente = ClienteSIIAU()
+        self.ultima_actualizacion = None
+        self.desactualizado = False
         # Cache de materias para evitar consultas repetidas
         self.materias_cache = {}
-
-    def obtener_datos_siiau(self):
-        """Obtiene todas las materias de ICOM usando BaseDatos y NRCs"""
+        self.claves_cache = {}
+        self.version = 0
+        self.version_estructura = 0
+        self.versiones_nrc = {}
+        self.diff = {}
+        self.render_cache = CacheRender()
+        self.horarios = MotorHorario()
+        self.consultas = CacheConsultas()
+        self.catalogo_busqueda = (None, [])  # (version_estructura, [(texto normalizado, nrc)])
+        self.indice_difuso = (None, None)  # (version_estructura, IndiceDifuso)
+        self.oyentes = []
+        self.agregados = AgregadosMalla(MALLA)
+        self.agregar_oyente(self.agregados.aplicar)
+        self.consulta_en_curso = None
+
+    async def obtener_datos_siiau(self, presupuesto=PRESUPUESTO):
+        """
+        Obtiene todas las materias de ICOM usando BaseDatos y NRCs. Si SIIAU
+        falla o el circuito está abierto, retorna el último snapshot bueno y
+        lo marca como desactualizado ({} si nunca se obtuvo uno).
+
+        La descarga (con sus reintentos y esperas) corre en un hilo para no
+        bloquear el event loop; el snapshot se aplica en el loop. Si ya hay
+        una descarga en curso se espera esa, a lo más presupuesto segundos:
+        pasado ese tiempo se retorna el snapshot actual.
+        """
+        propia = self.consulta_en_curso is None
+        if propia:
+            self.consulta_en_curso = asyncio.ensure_future(self._consultar(presupuesto))
+        consulta = asyncio.shield(self.consulta_en_curso)
+        if propia:
+            return await consulta
         try:
-            bd = BaseDatos("202520")
-            self.materias_cache = bd.NRCDict
-            logger.info(f"Obtenidas {len(self.materias_cache)} materias de ICOM")
+            return await asyncio.wait_for(consulta, presupuesto)
+        except asyncio.TimeoutError:
             return self.materias_cache
+
+    async def _consultar(self, presupuesto):
+        try:
+            materias = await asyncio.to_thread(self.descargar_oferta, presupuesto)
+            return self.aplicar_descarga(materias)
+        finally:
+            self.consulta_en_curso = None
+
+    def descargar_oferta(self, presupuesto=PRESUPUESTO):
+        """Descarga y procesa la oferta (bloquea). Retorna {nrc: Clase}, vacío si falló"""
+        try:
+            return BaseDatos("202520", cliente=self.cliente, presupuesto=presupuesto).NRCDict
         except Exception as e:
             logger.error(f"Error al obtener datos de SIIAU: {e}")
             return {}
 
+    def aplicar_descarga(self, materias):
+        """Aplica el resultado de descargar_oferta y retorna el snapshot vigente"""
+        if materias:
+            self.aplicar_snapshot(materias)
+            self.ultima_actualizacion = datetime.now()
+            self.desactualizado = False
+            logger.info(f"Obtenidas {len(self.materias_cache)} materias de ICOM")
+            return self.materias_cache
+        # Conservar el snapshot anterior para no invalidar todo el cache
+        self.diff = {}
+        self.desactualizado = bool(self.materias_cache)
+        return self.materias_cache
+
+    def aviso_desactualizado(self):
+        """Texto para agregar a las respuestas cuando se sirve un snapshot viejo"""
+        if not self.desactualizado or self.ultima_actualizacion is None:
+            return ""
+        minutos = int((datetime.now() - self.ultima_actualizacion).total_seconds() // 60)
+        return f"\n\n⚠️ _SIIAU no responde; datos de hace {minutos} min._"
+
+    def metricas(self):
+        """Estado del snapshot y de la consulta a SIIAU"""
+        antiguedad = None
+        if self.ultima_actualizacion is not None:
+            antiguedad = round((datetime.now() - self.ultima_actualizacion).total_seconds(), 1)
+        return {
+            'materias': len(self.materias_cache),
+            'version': self.version,
+            'desactualizado': self.desactualizado,
+            'antiguedad_s': antiguedad,
+            **self.cliente.metricas(),
+        }
+
+    def aplicar_snapshot(self, materias):
+        """Reemplaza el snapshot actual y calcula el diff contra el anterior"""
+        anteriores = self.materias_cache
+        diff = {}
+        for nrc, clase in materias.items():
+            previa = anteriores.get(nrc)
+            if previa is None or previa.datos != clase.datos:
+                diff[nrc] = (previa, clase)
+        for nrc, previa in anteriores.items():
+            if nrc not in materias:
+                diff[nrc] = (previa, None)
+        if diff:
+            self.version += 1
+            for nrc, (previa, clase) in diff.items():
+                if clase is None:
+                    self.versiones_nrc.pop(nrc, None)
+                else:
+                    self.versiones_nrc[nrc] = self.version
+            self.render_cache.invalidar(diff)
+            self.horarios.invalidar(diff)
+            if any(previa is None or clase is None or previa.getNombre() != clase.getNombre()
+                   or previa.getClave() != clase.getClave() for previa, clase in diff.values()):
+                self.version_estructura += 1
+        claves = {}
+        for nrc, clase in materias.items():
+            claves.setdefault(clase.getClave(), {})[nrc] = clase
+        inicial = not anteriores
+        self.diff = diff
+        self.materias_cache = materias
+        self.claves_cache = claves
+        if diff:
+            for oyente in self.oyentes:
+                try:
+                    oyente(diff, inicial)
+                except Exception as e:
+                    logger.error(f"Error notificando cambios de snapshot: {e}")
+        return diff
+
+    def catalogo(self):
+        """
+        Textos normalizados (nombre, clave y NRC) del snapshot con su NRC. Solo
+        se recalculan si cambia version_estructura, no con cada cambio de cupos.
+        """
+        version, textos = self.catalogo_busqueda
+        if version != self.version_estructura:
+            textos = [(normalizar(f"{c.getNombre()} {c.getClave()} {nrc}"), nrc)
+                      for nrc, c in self.materias_cache.items()]
+            self.catalogo_busqueda = (self.version_estructura, textos)
+        return textos
+
+    def buscar_texto(self, termino):
+        """Materias cuyo nombre, clave o NRC contienen el término, usando el cache de consultas"""
+        consulta = normalizar(termino)
+        if not consulta:
+            return []
+        # Las Clases se toman del snapshot actual para tener los cupos al día
+        resultado = self.consultas.buscar(consulta, self.version_estructura, self.catalogo)
+        return [self.materias_cache[nrc] for _, nrc in resultado if nrc in self.materias_cache]
+
+    def sugerencias(self, consulta):
+        """
+        Sugerencias "¿Quisiste decir?" para un NRC, clave o nombre no encontrado.
+        El índice solo se reconstruye si cambiaron NRCs, claves o nombres.
+        """
+        if not self.materias_cache:
+            return []
+        version, indice = self.indice_difuso
+        if indice is None or version != self.version_estructura:
+            indice = IndiceDifuso(self.materias_cache)
+            self.indice_difuso = (self.version_estructura, indice)
+        return indice.sugerir(consulta)
+
+    def agregar_oyente(self, oyente):
+        """Registra una función que recibe (diff, inicial) en cada cambio de snapshot"""
+        self.oyentes.append(oyente)
+
+    def render(self, materia, plantilla='info'):
+        """Retorna el mensaje formateado de una materia usando el cache de render"""
+        version = self.versiones_nrc.get(materia.getNRC(), self.version)
+        return self.render_cache.render(materia, version, plantilla)
+
     def buscar_materia(self, codigo):
         """Busca una materia por NRC o Clave"""
         # Buscar por NRC
@@ -289,21 +664,245 @@ class SiiauMonitor:
         
         return None
 
+class IndiceComodines:
+    """
+    Índice de suscripciones a una clave completa ("cualquier sección de IL355").
+
+    Las suscripciones se agrupan por clave igual que ClaveDict, de modo que al
+    llegar un diff solo se revisan los suscriptores de las claves cuyas
+    secciones cambiaron: el costo depende de las secciones modificadas y no del
+    número de secciones x suscripciones.
+
+    Atributos:
+        por_clave: {clave: {user_id: info_suscripcion}}
+    """
+
+    def __init__(self):
+        self.por_clave = {}
+
+    def reconstruir(self, suscripciones):
+        """Reconstruye el índice a partir de CuposBot.suscripciones"""
+        self.por_clave = {}
+        for user_id, subs in suscripciones.items():
+            for codigo, info in subs.items():
+                if info.get('tipo') == 'clave':
+                    self.agregar(user_id, codigo, info)
+
+    def agregar(self, user_id, clave, info):
+        self.por_clave.setdefault(clave, {})[user_id] = info
+
+    def quitar(self, user_id, clave):
+        suscriptores = self.por_clave.get(clave)
+        if suscriptores is not None:
+            suscriptores.pop(user_id, None)
+            if not suscriptores:
+                del self.por_clave[clave]
+
+    @staticmethod
+    def cumple_filtros(clase, info):
+        """Aplica los filtros opcionales de profesor y hora de inicio"""
+        profesor = info.get('profesor')
+        if profesor and profesor.lower() not in str(clase.getProfesor()).lower():
+            return False
+        hora = info.get('hora')
+        if hora and not any(len(s) > 1 and str(s[1]).startswith(hora) for s in clase.getSesiones()):
+            return False
+        return True
+
+    def evaluar(self, diff, inicial=False):
+        """
+        Retorna [(user_id, clave, clase)] para las secciones que pasaron de no
+        tener cupos a tenerlos. Las secciones nuevas solo cuentan si no es el
+        primer snapshot (para no alertar de todo al arrancar el bot).
+        """
+        aperturas = []
+        for nrc, (previa, clase) in diff.items():
+            if clase is None or not clase.tiene_cupos():
+                continue
+            if previa is None and inicial:
+                continue
+            if previa is not None and previa.tiene_cupos():
+                continue
+            suscriptores = self.por_clave.get(clase.getClave())
+            if not suscriptores:
+                continue
+            for user_id, info in suscriptores.items():
+                if IndiceComodines.cumple_filtros(clase, info):
+                    aperturas.append((user_id, clase.getClave(), clase))
+        return aperturas
+
+    def secciones_abiertas(self, clave, info, claves_cache):
+        """Secciones de la clave que hoy tienen cupos y cumplen los filtros"""
+        return [c for c in claves_cache.get(clave, {}).values()
+                if c.tiene_cupos() and IndiceComodines.cumple_filtros(c, info)]
+
+class MotorResumen:
+    """
+    Programa los resúmenes periódicos de cada usuario.
+
+    Cada usuario tiene una frecuencia propia y un desfase derivado de un hash
+    de su user_id, de modo que los envíos se reparten a lo largo del intervalo
+    en lugar de salir todos a la vez. Un resumen solo se envía si las materias
+    suscritas cambiaron desde el último resumen del usuario.
+
+    Atributos:
+        frecuencias: Minutos entre resúmenes por usuario (0 = desactivado)
+        ultima_ranura: Última ranura de tiempo evaluada por usuario
+        huellas: Huella de las suscripciones en el último resumen enviado
+
+    Las ranuras y huellas se guardan en preferencias.json junto con la
+    frecuencia, para que un reinicio no provoque resúmenes sin cambios.
+    """
+    FRECUENCIA_DEFAULT = 30   # Minutos entre resúmenes
+    FRECUENCIA_MINIMA = 10
+    FRECUENCIA_MAXIMA = 1440
+    INTERVALO_TICK = 60       # Segundos entre evaluaciones del motor
+
+    def __init__(self):
+        self.frecuencias = {}
+        self.ultima_ranura = {}
+        self.huellas = {}
+
+    def frecuencia(self, user_id):
+        return self.frecuencias.get(user_id, MotorResumen.FRECUENCIA_DEFAULT)
+
+    def configurar(self, user_id, minutos):
+        """Cambia la frecuencia de un usuario y reinicia su programación"""
+        if minutos == MotorResumen.FRECUENCIA_DEFAULT:
+            self.frecuencias.pop(user_id, None)
+        else:
+            self.frecuencias[user_id] = minutos
+        self.ultima_ranura.pop(user_id, None)
+
+    @staticmethod
+    def desfase(user_id, periodo):
+        """Desfase estable (en segundos) del usuario dentro de su periodo"""
+        return zlib.crc32(str(user_id).encode()) % periodo
+
+    def toca_enviar(self, user_id, ahora):
+        """
+        Indica si el usuario cruzó el inicio de una nueva ranura desde la última
+        evaluación. La primera evaluación solo registra la ranura actual.
+        """
+        minutos = self.frecuencia(user_id)
+        if not minutos:
+            return False
+        periodo = minutos * 60
+        ranura = int((ahora - MotorResumen.desfase(user_id, periodo)) // periodo)
+        anterior = self.ultima_ranura.get(user_id)
+        self.ultima_ranura[user_id] = ranura
+        return anterior is not None and ranura != anterior
+
+    @staticmethod
+    def huella(suscripciones_usuario, monitor):
+        """
+        Identifica el estado de las materias suscritas en el snapshot actual.
+        Se calcula sobre los datos (no sobre las versiones del snapshot, que
+        reinician con el proceso) para poder compararla después de un reinicio.
+        Una suscripción por clave incluye los datos de todas sus secciones.
+        """
+        estado = []
+        for nrc, info in sorted(suscripciones_usuario.items()):
+            if info.get('tipo') == 'clave':
+                secciones = monitor.claves_cache.get(nrc, {})
+                estado.append((nrc, sorted((n, c.datos) for n, c in secciones.items())))
+                continue
+            materia = monitor.materias_cache.get(nrc)
+            estado.append((nrc, materia.datos if materia is not None else None))
+        return f"{zlib.crc32(repr(estado).encode()):08x}"
+
+    def hubo_cambios(self, user_id, huella):
+        return self.huellas.get(user_id) != huella
+
+    def registrar_envio(self, user_id, huella):
+        self.huellas[user_id] = huella
+
+    def olvidar(self, user_id):
+        """Descarta la programación de un usuario sin suscripciones (conserva su frecuencia)"""
+        encontrado = user_id in self.huellas or user_id in self.ultima_ranura
+        self.huellas.pop(user_id, None)
+        self.ultima_ranura.pop(user_id, None)
+        return encontrado
+
+    def podar(self, activos):
+        """Olvida a los usuarios que ya no están en activos; retorna True si quitó alguno"""
+        inactivos = (set(self.huellas) | set(self.ultima_ranura)) - set(activos)
+        for user_id in inactivos:
+            self.olvidar(user_id)
+        return bool(inactivos)
+
+    def exportar(self):
+        """Preferencias y estado por usuario para preferencias.json"""
+        datos = {}
+        for user_id, minutos in self.frecuencias.items():
+            datos.setdefault(user_id, {})['resumen_minutos'] = minutos
+        for user_id, ranura in self.ultima_ranura.items():
+            datos.setdefault(user_id, {})['ranura'] = ranura
+        for user_id, huella in self.huellas.items():
+            datos.setdefault(user_id, {})['huella'] = huella
+        return datos
+
+    def importar(self, user_id, prefs):
+        if 'resumen_minutos' in prefs:
+            self.configurar(user_id, int(prefs['resumen_minutos']))
+        if prefs.get('ranura') is not None:
+            self.ultima_ranura[user_id] = int(prefs['ranura'])
+        if prefs.get('huella'):
+            self.huellas[user_id] = prefs['huella']
+
 class CuposBot:
-    """Bot de Telegram para monitorear cupos"""
+    """
+    Bot de Telegram para monitorear cupos.
+
+    Args:
+        fragmento: sharding.Fragmento si el bot corre como uno de varios
+            workers; en ese caso solo guarda y notifica a sus propios usuarios.
+    """
+    MAX_RESULTADOS_INLINE = 20
+    ESPERA_ALERTA_CLAVE = timedelta(hours=1)  # Mínimo entre alertas del mismo NRC por clave
+    VIGENCIA_SIN_SUSCRIPTORES = timedelta(minutes=5)  # Refresco de la oferta si nadie está suscrito
     
-    def __init__(self):
+    def __init__(self, fragmento=None):
         self.monitor = SiiauMonitor()
+        self.fragmento = fragmento
         self.suscripciones = {}  # {user_id: {nrc: {threshold: int, last_notified: datetime}}}
         self.data_file = "suscripciones.json"
+        self.preferencias_file = "preferencias.json"
+        if fragmento is not None:
+            self.data_file = f"suscripciones.{fragmento.worker_id}.json"
+            self.preferencias_file = f"preferencias.{fragmento.worker_id}.json"
+        self.resumenes = MotorResumen()
+        self.reloj = datetime.now  # Fuente de tiempo para monitoreo y resúmenes
+        self.comodines = IndiceComodines()
+        self.aperturas_pendientes = []  # [(user_id, clave, Clase)] por notificar
+        self.alertas_clave = {}  # {(user_id, clave, nrc): datetime} última alerta por clave
+        self.feed = None  # events.FeedEventos si se publica el feed local de cambios
         self.cargar_suscripciones()
+        self.cargar_preferencias()
+        self.comodines.reconstruir(self.suscripciones)
+        self.monitor.agregar_oyente(self.registrar_aperturas)
+
+    def archivo_inicial(self, archivo, archivo_global):
+        """
+        En modo distribuido, si el fragmento aún no tiene archivo propio se parte
+        del archivo global (se filtran los usuarios ajenos al cargarlo).
+        """
+        if self.fragmento is not None and not os.path.exists(archivo) and os.path.exists(archivo_global):
+            return archivo_global
+        return archivo
+
+    def filtrar_propios(self, data):
+        if self.fragmento is None:
+            return data
+        return {user_id: valor for user_id, valor in data.items() if self.fragmento.es_propio(user_id)}
 
     def cargar_suscripciones(self):
         """Carga suscripciones desde archivo"""
         try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r') as f:
-                    data = json.load(f)
+            archivo = self.archivo_inicial(self.data_file, "suscripciones.json")
+            if os.path.exists(archivo):
+                with open(archivo, 'r') as f:
+                    data = self.filtrar_propios(json.load(f))
                     # Convertir strings de datetime de vuelta a datetime objects
                     for user_id, subs in data.items():
                         for nrc, info in subs.items():
@@ -334,6 +933,69 @@ class CuposBot:
         except Exception as e:
             logger.error(f"Error guardando suscripciones: {e}")
 
+    async def actualizar_materias(self, sondear=False):
+        """
+        Retorna la oferta actual. En modo normal consulta SIIAU; en modo
+        distribuido aplica los diffs del almacén y solo consulta SIIAU si
+        sondear es True y este worker tiene el lease.
+        """
+        if self.fragmento is None:
+            # Los comandos esperan menos que el ciclo de monitoreo
+            return await self.monitor.obtener_datos_siiau(PRESUPUESTO if sondear else PRESUPUESTO_COMANDO)
+        try:
+            return await self.fragmento.sincronizar(
+                self.monitor, lambda filas: BaseDatos(datos=filas).NRCDict, sondear=sondear
+            )
+        except Exception as e:
+            logger.error(f"Error sincronizando con el almacén compartido: {e}")
+            return self.monitor.materias_cache
+
+    async def reenviar_ajenos(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Modo distribuido: los mensajes de usuarios de otro fragmento se encolan
+        para su worker dueño y no se procesan aquí.
+        """
+        if self.fragmento is None or update.message is None or update.effective_user is None:
+            return
+        user_id = str(update.effective_user.id)
+        if self.fragmento.es_propio(user_id):
+            return
+        self.fragmento.almacen.encolar(self.fragmento.anillo.worker_de(user_id), update.to_json())
+        raise ApplicationHandlerStop
+
+    async def procesar_operaciones(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Modo distribuido: procesa los mensajes que el worker frontal reenvió a este fragmento"""
+        try:
+            for data in self.fragmento.almacen.tomar_operaciones(self.fragmento.worker_id):
+                await context.application.process_update(Update.de_json(data, context.bot))
+        except Exception as e:
+            logger.error(f"Error procesando operaciones reenviadas: {e}")
+
+    def registrar_aperturas(self, diff, inicial):
+        """Oyente del monitor: acumula las aperturas de secciones para las suscripciones por clave"""
+        self.aperturas_pendientes.extend(self.comodines.evaluar(diff, inicial))
+
+    def cargar_preferencias(self):
+        """Carga las frecuencias de resumen y el estado de cada usuario desde archivo"""
+        try:
+            archivo = self.archivo_inicial(self.preferencias_file, "preferencias.json")
+            if os.path.exists(archivo):
+                with open(archivo, 'r') as f:
+                    data = self.filtrar_propios(json.load(f))
+                for user_id, prefs in data.items():
+                    self.resumenes.importar(user_id, prefs)
+        except Exception as e:
+            logger.error(f"Error cargando preferencias: {e}")
+
+    def guardar_preferencias(self):
+        """Guarda las frecuencias de resumen y el estado de cada usuario a archivo"""
+        try:
+            data_to_save = self.resumenes.exportar()
+            with open(self.preferencias_file, 'w') as f:
+                json.dump(data_to_save, f, indent=2)
+        except Exception as e:
+            logger.error(f"Error guardando preferencias: {e}")
+
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Comando /start"""
         mensaje = """
@@ -342,11 +1004,16 @@ class CuposBot:
 Este bot te ayuda a monitorear los cupos disponibles de materias en SIIAU Escolar.
 
 *Comandos disponibles:*
-`/suscribir [NRC/Clave]` - Suscribirse a una materia
-`/desuscribir [NRC/Clave]` - Desuscribirse de una materia  
+`/suscribir [NRC/Clave/semestre ...]` - Suscribirse a una o varias materias
+`/suscribir_clave [Clave]` - Avisar cuando abra cualquier sección
+`/desuscribir [NRC/Clave/semestre ...]` - Desuscribirse de una o varias materias  
 `/mis_suscripciones` - Ver tus suscripciones activas
 `/verificar [NRC/Clave]` - Verificar cupos actuales
 `/buscar [término]` - Buscar materias
+`/resumen [minutos/off]` - Frecuencia del resumen periódico
+`/horario [claves/semestre]` - Armar horarios sin choques
+`/semestre [nombre]` - Cupos por semestre de la malla
+`/estado` - Estado de la conexión con SIIAU
 `/ayuda` - Mostrar ayuda detallada
 
 ¡Comienza suscribiéndote a una materia! 📚
@@ -360,12 +1027,17 @@ Este bot te ayuda a monitorear los cupos disponibles de materias en SIIAU Escola
 
 *Comandos principales:*
 
-🔔 `/suscribir [NRC/Clave]`
-   Ejemplo: `/suscribir 12345` o `/suscribir I5919`
+🔔 `/suscribir [NRC/Clave/semestre ...]`
+   Ejemplo: `/suscribir 12345 12346 I5919` o `/suscribir primero`
    Te notificaré cuando haya cupos disponibles.
+   Una clave o semestre te avisa de cualquier sección.
 
-🔕 `/desuscribir [NRC/Clave]`  
-   Cancela las notificaciones de una materia.
+🔔 `/suscribir_clave [Clave] [profesor:nombre] [hora:HHMM]`
+   Ejemplo: `/suscribir_clave IL355` o `/suscribir_clave IL355 profesor:perez hora:0700`
+   Te notificaré cuando cualquier sección de esa clave abra cupos.
+
+🔕 `/desuscribir [NRC/Clave/semestre ...]`  
+   Cancela las notificaciones de una o varias materias.
 
 📋 `/mis_suscripciones`
    Muestra todas tus suscripciones activas.
@@ -376,6 +1048,23 @@ Este bot te ayuda a monitorear los cupos disponibles de materias en SIIAU Escola
 🔎 `/buscar [término]`
    Busca materias por nombre, clave o NRC.
 
+🗓️ `/horario [claves/semestre] [cupos]`
+   Ejemplo: `/horario IL355 IL356` o `/horario quinto cupos`
+   Arma combinaciones de secciones sin choques de horario.
+   Agrega `cupos` para usar solo secciones con cupos.
+
+📊 `/semestre [nombre]`
+   Ejemplo: `/semestre primero`
+   Muestra qué claves del semestre tienen cupos y su ocupación.
+
+🕒 `/resumen [minutos/off]`
+   Ejemplo: `/resumen 60` o `/resumen off`
+   Cambia cada cuánto recibes el resumen de tus suscripciones.
+   Solo se envía si alguna de tus materias cambió.
+
+🩺 `/estado`
+   Muestra si SIIAU responde y qué tan recientes son los datos.
+
 *Notas importantes:*
 • El bot verifica cupos cada 10 segundos
 • Solo te notifica cuando hay cupos disponibles
@@ -384,73 +1073,270 @@ Este bot te ayuda a monitorear los cupos disponibles de materias en SIIAU Escola
         """
         await update.message.reply_text(mensaje, parse_mode='Markdown')
 
+    async def resolver_codigos(self, codigos):
+        """
+        Clasifica los argumentos de /suscribir en una sola pasada sobre la oferta en cache.
+
+        Returns:
+            (materias, claves, sin_secciones, no_encontrados): Clases de los
+            NRCs, claves (directas o de un semestre de la malla), claves de
+            los semestres que hoy no tienen secciones y códigos desconocidos
+        """
+        if not self.monitor.materias_cache:
+            await self.actualizar_materias()
+        materias, claves, sin_secciones, no_encontrados = {}, {}, {}, []
+        for codigo in codigos:
+            codigo = codigo.strip().strip(',')
+            if not codigo:
+                continue
+            if codigo.lower() in MALLA:
+                for clave in MALLA[codigo.lower()]:
+                    if clave in self.monitor.claves_cache:
+                        claves[clave] = None
+                    else:
+                        sin_secciones[clave] = None
+                continue
+            clase = self.monitor.materias_cache.get(codigo)
+            if clase is not None:
+                materias[codigo] = clase
+            elif codigo.upper() in self.monitor.claves_cache:
+                claves[codigo.upper()] = None
+            else:
+                no_encontrados.append(codigo)
+        return list(materias.values()), list(claves), list(sin_secciones), no_encontrados
+
+    def notas_suscripcion(self, ya_suscritas, sin_secciones, no_encontrados):
+        """Líneas finales de /suscribir con lo que no se suscribió y por qué"""
+        lineas = []
+        if ya_suscritas:
+            lineas.append(f"ℹ️ Ya estabas suscrito a: {', '.join(f'`{c}`' for c in ya_suscritas)}")
+        if sin_secciones:
+            lineas.append(f"⚠️ Sin secciones en la oferta: {', '.join(f'`{c}`' for c in sin_secciones)}")
+        if no_encontrados:
+            lineas.append(f"❌ No encontrados: {', '.join(f'`{c}`' for c in no_encontrados)}"
+                          + formatear_sugerencias(self.monitor.sugerencias(no_encontrados[0])))
+        return "\n".join(lineas)
+
+    @staticmethod
+    def nueva_suscripcion_nrc(clase):
+        return {
+            'codigo': clase.getNRC(),
+            'clave': clase.getClave(),
+            'nombre': clase.getNombre(),
+            'profesor': clase.getProfesor(),
+            'cupos': clase.get('CUP'),
+            'disponibles': clase.get('DIS'),
+            'threshold': 1,
+            'last_notified': None
+        }
+
     async def suscribir(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Comando /suscribir mejorado: requiere clave y NRC"""
+        """
+        Comando /suscribir: acepta varios NRCs, claves o semestres de la malla.
+        Se valida todo contra la oferta en cache y se guarda una sola vez.
+        """
         if len(context.args) < 1:
-            await update.message.reply_text("❌ Proporciona el NRC.\nEjemplo: `/suscribir 216502`", parse_mode='Markdown')
+            await update.message.reply_text(
+                "❌ Proporciona uno o varios NRC, claves o un semestre.\n"
+                "Ejemplo: `/suscribir 216502 216503 IL355` o `/suscribir primero`",
+                parse_mode='Markdown'
+            )
             return
 
-        nrc = context.args[0].strip()
         user_id = str(update.effective_user.id)
+        materias, claves, sin_secciones, no_encontrados = await self.resolver_codigos(context.args)
 
-        await update.message.reply_text(f"🔄 Buscando información de NRC {nrc} en SIIAU...")
-        bd = BaseDatos()
-        clase = bd.findNRC(nrc)
+        if not materias and not claves and not sin_secciones:
+            if not self.monitor.materias_cache:
+                await update.message.reply_text("❌ No se pudieron obtener datos de SIIAU.")
+                return
+            codigo = no_encontrados[0] if no_encontrados else context.args[0]
+            sugerencias = formatear_sugerencias(self.monitor.sugerencias(codigo))
+            await update.message.reply_text(f"❌ No se encontró la materia: `{codigo}`.{sugerencias}", parse_mode='Markdown')
+            return
 
-        if not clase:
-            await update.message.reply_text(f"❌ No se encontró la materia con NRC `{nrc}`.", parse_mode='Markdown')
+        # Las suscripciones que ya existen no se reemplazan: conservan su
+        # last_notified y, las de clave, sus filtros de /suscribir_clave
+        existentes = self.suscripciones.get(user_id, {})
+        ya_suscritas = [c.getNRC() for c in materias if c.getNRC() in existentes]
+        ya_suscritas += [clave for clave in claves if clave in existentes]
+        materias = [c for c in materias if c.getNRC() not in existentes]
+        claves = [clave for clave in claves if clave not in existentes]
+        notas = self.notas_suscripcion(ya_suscritas, sin_secciones, no_encontrados)
+        if not materias and not claves:
+            await update.message.reply_text(notas, parse_mode='Markdown')
             return
 
-        if user_id not in self.suscripciones:
-            self.suscripciones[user_id] = {}
+        suscripciones_usuario = self.suscripciones.setdefault(user_id, {})
+        for clase in materias:
+            suscripciones_usuario[clase.getNRC()] = CuposBot.nueva_suscripcion_nrc(clase)
+        for clave in claves:
+            nombre = next(iter(self.monitor.claves_cache[clave].values())).getNombre()
+            info = self.nueva_suscripcion_clave(clave, nombre, {})
+            suscripciones_usuario[clave] = info
+            self.comodines.agregar(user_id, clave, info)
+        self.guardar_suscripciones()
 
-        self.suscripciones[user_id][clase.getNRC()] = {
-            'codigo': f"{nrc}",
-            'nombre': clase.getNombre(),
-            'profesor': clase.getProfesor(),
-            'cupos': clase.get('CUP'),
-            'disponibles': clase.get('DIS'),
-            'threshold': 1,
-            'last_notified': None
-        }
+        if len(materias) == 1 and not claves and not notas:
+            clase = materias[0]
+            mensaje = f"✅ *Suscripción activada*\n\n{self.monitor.render(clase, 'info')}\n\nTe notificaré cuando tenga cupos disponibles."
+            await update.message.reply_text(mensaje, parse_mode='Markdown')
+            return
+
+        mensaje = f"✅ *Suscripciones activadas ({len(materias) + len(claves)})*\n\n"
+        for clase in materias:
+            status = "✅" if clase.tiene_cupos() else "❌"
+            mensaje += f"• {status} `{clase.getNRC()}` {clase.getNombre()} ({clase.cupos_disponibles()}/{clase.cupos_totales()})\n"
+        for clave in claves:
+            mensaje += f"• 🔔 `{clave}` {suscripciones_usuario[clave]['nombre']} (cualquier sección)\n"
+        if notas:
+            mensaje += f"\n{notas}"
+        mensaje += "\n\nTe notificaré cuando tengan cupos disponibles."
+        await update.message.reply_text(mensaje, parse_mode='Markdown')
+
+    async def suscribir_clave(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando /suscribir_clave: suscripción a todas las secciones de una clave"""
+        if len(context.args) < 1:
+            await update.message.reply_text(
+                "❌ Proporciona la clave.\nEjemplo: `/suscribir_clave IL355 profesor:perez hora:0700`",
+                parse_mode='Markdown'
+            )
+            return
+
+        clave = context.args[0].strip().upper()
+        filtros = {'profesor': None, 'hora': None}
+        for arg in context.args[1:]:
+            nombre, _, valor = arg.partition(':')
+            if nombre.lower() in filtros and valor:
+                filtros[nombre.lower()] = valor.strip()
+        user_id = str(update.effective_user.id)
+
+        if not self.monitor.materias_cache:
+            await self.actualizar_materias()
+        secciones = self.monitor.claves_cache.get(clave)
+        if not secciones:
+            sugerencias = formatear_sugerencias(self.monitor.sugerencias(clave))
+            await update.message.reply_text(f"❌ No se encontró la clave `{clave}`.{sugerencias}", parse_mode='Markdown')
+            return
+
+        info = self.nueva_suscripcion_clave(clave, next(iter(secciones.values())).getNombre(), filtros)
+        self.suscripciones.setdefault(user_id, {})[clave] = info
+        self.comodines.agregar(user_id, clave, info)
         self.guardar_suscripciones()
 
-        mensaje = f"✅ *Suscripción activada*\n\n{clase.info_cupos()}\n\nTe notificaré cuando tenga cupos disponibles."
+        mensaje = f"✅ *Suscripción a clave activada*\n\n📚 *{info['nombre']}* (`{clave}`)\n"
+        mensaje += f"📋 {len(secciones)} secciones{self.describir_filtros(info)}\n"
+        abiertas = self.comodines.secciones_abiertas(clave, info, self.monitor.claves_cache)
+        if abiertas:
+            nrcs = ", ".join(f"`{c.getNRC()}`" for c in abiertas[:10])
+            mensaje += f"\n✅ Ya tienen cupos: {nrcs}\n"
+        mensaje += "\nTe notificaré cuando cualquier sección abra cupos."
         await update.message.reply_text(mensaje, parse_mode='Markdown')
 
+    @staticmethod
+    def nueva_suscripcion_clave(clave, nombre, filtros):
+        return {
+            'tipo': 'clave',
+            'codigo': clave,
+            'nombre': nombre,
+            'profesor': filtros.get('profesor'),
+            'hora': filtros.get('hora'),
+            'last_notified': None
+        }
+
+    @staticmethod
+    def describir_filtros(info):
+        partes = []
+        if info.get('profesor'):
+            partes.append(f"profesor: {info['profesor']}")
+        if info.get('hora'):
+            partes.append(f"hora: {info['hora']}")
+        return f" ({', '.join(partes)})" if partes else ""
+
+    def sugerencias_propias(self, user_id, codigo):
+        """Sugiere entre las suscripciones del usuario (son pocas, se comparan todas)"""
+        cercanas = sorted(
+            (distancia(normalizar(codigo), normalizar(texto), 2), nrc, info['nombre'])
+            for nrc, info in self.suscripciones.get(user_id, {}).items()
+            for texto in (nrc, info['nombre'])
+        )
+        vistas = []
+        for d, nrc, nombre in cercanas:
+            if d <= 2 and nrc not in [v[0] for v in vistas]:
+                vistas.append((nrc, nombre))
+        return vistas[:3]
+
+    def clave_de_suscripcion(self, nrc, info):
+        """Clave de una suscripción por NRC (las antiguas no la guardaban)"""
+        if info.get('clave'):
+            return info['clave']
+        materia = self.monitor.materias_cache.get(nrc)
+        return materia.getClave() if materia else None
+
     async def desuscribir(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Comando /desuscribir"""
+        """
+        Comando /desuscribir: acepta varios NRCs, claves o semestres de la malla.
+        Una clave quita la suscripción a la clave y a sus NRCs; se guarda una sola vez.
+        """
         if not context.args:
-            await update.message.reply_text("❌ Proporciona un NRC o Clave.\nEjemplo: `/desuscribir 12345`", parse_mode='Markdown')
+            await update.message.reply_text(
+                "❌ Proporciona uno o varios NRC, claves o un semestre.\nEjemplo: `/desuscribir 12345 IL355`",
+                parse_mode='Markdown'
+            )
             return
 
-        codigo = context.args[0].strip()
         user_id = str(update.effective_user.id)
 
         if user_id not in self.suscripciones:
             await update.message.reply_text("❌ No tienes suscripciones activas.")
             return
 
-        # Buscar por NRC directo o por código guardado
-        nrc_a_eliminar = None
-        for nrc, info in self.suscripciones[user_id].items():
-            if nrc == codigo or info['codigo'] == codigo:
-                nrc_a_eliminar = nrc
-                break
-
-        if not nrc_a_eliminar:
-            await update.message.reply_text(f"❌ No estás suscrito a la materia: `{codigo}`", parse_mode='Markdown')
+        suscripciones_usuario = self.suscripciones[user_id]
+        claves_objetivo = set()
+        codigos_objetivo = set()
+        for codigo in context.args:
+            codigo = codigo.strip().strip(',')
+            if codigo.lower() in MALLA:
+                claves_objetivo.update(MALLA[codigo.lower()])
+            elif codigo:
+                codigos_objetivo.add(codigo)
+                claves_objetivo.add(codigo.upper())
+
+        eliminadas = []
+        encontrados = set()
+        for nrc, info in list(suscripciones_usuario.items()):
+            clave = nrc if info.get('tipo') == 'clave' else self.clave_de_suscripcion(nrc, info)
+            por_codigo = nrc in codigos_objetivo or info['codigo'] in codigos_objetivo
+            if por_codigo or clave in claves_objetivo:
+                encontrados.update(c for c in (nrc, info['codigo'], clave) if c in codigos_objetivo or c in claves_objetivo)
+                del suscripciones_usuario[nrc]
+                if info.get('tipo') == 'clave':
+                    self.comodines.quitar(user_id, nrc)
+                    self.olvidar_alertas_clave(user_id, nrc)
+                eliminadas.append(info)
+
+        if not eliminadas:
+            codigo = context.args[0].strip()
+            sugerencias = formatear_sugerencias(self.sugerencias_propias(user_id, codigo))
+            await update.message.reply_text(f"❌ No estás suscrito a la materia: `{codigo}`{sugerencias}", parse_mode='Markdown')
             return
 
-        materia_info = self.suscripciones[user_id][nrc_a_eliminar]
-        del self.suscripciones[user_id][nrc_a_eliminar]
-        
-        if not self.suscripciones[user_id]:
+        if not suscripciones_usuario:
             del self.suscripciones[user_id]
+            if self.resumenes.olvidar(user_id):
+                self.guardar_preferencias()
 
         self.guardar_suscripciones()
-        
-        await update.message.reply_text(f"✅ Te has desuscrito de: *{materia_info['nombre']}*", parse_mode='Markdown')
+
+        sin_match = [c for c in codigos_objetivo if c not in encontrados and c.upper() not in encontrados]
+        if len(eliminadas) == 1:
+            mensaje = f"✅ Te has desuscrito de: *{eliminadas[0]['nombre']}*\n"
+        else:
+            mensaje = f"✅ *Te has desuscrito de {len(eliminadas)} suscripciones:*\n\n"
+            mensaje += "".join(f"• `{info['codigo']}` {info['nombre']}\n" for info in eliminadas)
+        if sin_match:
+            mensaje += f"\n❌ No estabas suscrito a: {', '.join(f'`{c}`' for c in sorted(sin_match))}"
+        await update.message.reply_text(mensaje, parse_mode='Markdown')
 
     async def mis_suscripciones(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Comando /mis_suscripciones"""
@@ -462,21 +1348,21 @@ Este bot te ayuda a monitorear los cupos disponibles de materias en SIIAU Escola
 
         mensaje = "📋 *Tus suscripciones activas:*\n\n"
         # Obtener datos actualizados
-        materias = self.monitor.obtener_datos_siiau()
+        materias = await self.actualizar_materias()
         for nrc, info in self.suscripciones[user_id].items():
+            if info.get('tipo') == 'clave':
+                abiertas = self.comodines.secciones_abiertas(nrc, info, self.monitor.claves_cache)
+                mensaje += f"• 🔔 *{info['nombre']}* (Clave: `{nrc}`){self.describir_filtros(info)}\n"
+                mensaje += f"  ✅ {len(abiertas)} secciones con cupos\n\n"
+                continue
             materia = materias.get(nrc)
             if materia:
-                status = "✅" if materia.tiene_cupos() else "❌"
-                mensaje += f"• {status} *{materia.getNombre()}*\n"
-                mensaje += f"  🔢 NRC: `{materia.getNRC()}`\n"
-                mensaje += f"  📝 Clave: `{materia.getClave()}`\n"
-                mensaje += f"  👥 Cupos: {materia.cupos_disponibles()}/{materia.cupos_totales()}\n"
-                mensaje += f"  👨‍🏫 Profesor: {materia.getProfesor()}\n"
-                mensaje += f"  🕐 Horario: {materia.getHorarios()}\n\n"
+                mensaje += self.monitor.render(materia, 'listado')
             else:
                 mensaje += f"• ❌ *{info['nombre']}* (NRC: `{nrc}`)\n"
                 mensaje += f"  ⚠️ No encontrada en ciclo actual\n\n"
         mensaje += f"📊 Total: {len(self.suscripciones[user_id])} suscripciones"
+        mensaje += self.monitor.aviso_desactualizado()
         await update.message.reply_text(mensaje, parse_mode='Markdown')
 
     async def verificar(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -488,21 +1374,23 @@ Este bot te ayuda a monitorear los cupos disponibles de materias en SIIAU Escola
         codigo = context.args[0].strip()
         
         await update.message.reply_text("🔄 Consultando SIIAU...")
-        materias = self.monitor.obtener_datos_siiau()
+        materias = await self.actualizar_materias()
         if not materias:
             await update.message.reply_text("❌ No se pudieron obtener datos de SIIAU.")
             return
         
         materia = self.monitor.buscar_materia(codigo)
         if not materia:
-            await update.message.reply_text(f"❌ No se encontró la materia: `{codigo}`", parse_mode='Markdown')
+            sugerencias = formatear_sugerencias(self.monitor.sugerencias(codigo))
+            await update.message.reply_text(f"❌ No se encontró la materia: `{codigo}`{sugerencias}", parse_mode='Markdown')
             return
         
-        mensaje = f"🔍 *Consulta actual:*\n\n{materia.info_cupos()}"
+        mensaje = f"🔍 *Consulta actual:*\n\n{self.monitor.render(materia, 'info')}"
         if materia.tiene_cupos():
             mensaje += "\n\n✅ *¡Hay cupos disponibles!*"
         else:
             mensaje += "\n\n❌ *Sin cupos disponibles*"
+        mensaje += self.monitor.aviso_desactualizado()
         await update.message.reply_text(mensaje, parse_mode='Markdown')
 
     async def buscar(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -514,50 +1402,75 @@ Este bot te ayuda a monitorear los cupos disponibles de materias en SIIAU Escola
         termino = " ".join(context.args).lower()
         
         await update.message.reply_text("🔍 Buscando en SIIAU...")
-        materias = self.monitor.obtener_datos_siiau()
+        materias = await self.actualizar_materias()
         if not materias:
             await update.message.reply_text("❌ No se pudieron obtener datos de SIIAU.")
             return
         
-        resultados = []
-        for materia in materias.values():
-            if (termino in materia.getNombre().lower() or 
-                termino in materia.getClave().lower() or 
-                termino in materia.getNRC()):
-                resultados.append(materia)
+        resultados = self.monitor.buscar_texto(termino)
         
         if not resultados:
-            await update.message.reply_text(f"❌ No se encontraron materias con: `{termino}`", parse_mode='Markdown')
+            sugerencias = formatear_sugerencias(self.monitor.sugerencias(termino))
+            await update.message.reply_text(f"❌ No se encontraron materias con: `{termino}`{sugerencias}", parse_mode='Markdown')
             return
         
         # Limitar a 10 resultados
         resultados = resultados[:10]
         mensaje = f"🔍 *Resultados para '{termino}':*\n\n"
         for materia in resultados:
-            status = "✅" if materia.tiene_cupos() else "❌"
-            mensaje += f"• {status} *{materia.getNombre()}*\n"
-            mensaje += f"  🔢 NRC: `{materia.getNRC()}`\n"
-            mensaje += f"  📝 Clave: `{materia.getClave()}`\n"
-            mensaje += f"  👥 Cupos: {materia.cupos_disponibles()}/{materia.cupos_totales()}\n"
-            mensaje += f"  👨‍🏫 Profesor: {materia.getProfesor()}\n"
-            mensaje += f"  🕐 Horario: {materia.getHorarios()}\n\n"
+            mensaje += self.monitor.render(materia, 'listado')
 
         if len(resultados) == 10:
             mensaje += f"... y más resultados disponibles"
+        mensaje += self.monitor.aviso_desactualizado()
         await update.message.reply_text(mensaje, parse_mode='Markdown')
 
+    async def consulta_inline(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Modo inline (`@bot álgebra`): responde con tarjetas de materias desde la
+        oferta en memoria, sin consultar SIIAU.
+        """
+        consulta = update.inline_query.query
+        resultados = []
+        for materia in self.monitor.buscar_texto(consulta)[:CuposBot.MAX_RESULTADOS_INLINE]:
+            status = "✅" if materia.tiene_cupos() else "❌"
+            resultados.append(InlineQueryResultArticle(
+                id=materia.getNRC(),
+                title=f"{status} {materia.getNombre()} ({materia.getClave()})",
+                description=f"NRC {materia.getNRC()} | Cupos {materia.cupos_disponibles()}/"
+                            f"{materia.cupos_totales()} | {materia.getProfesor()}",
+                input_message_content=InputTextMessageContent(
+                    self.monitor.render(materia, 'info'), parse_mode='Markdown'
+                ),
+            ))
+        await update.inline_query.answer(resultados, cache_time=10)
+
     async def monitorear_cupos(self, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Función que monitorea los cupos periódicamente"""
         logger.info("Iniciando verificación de cupos cada 10 segundos...")
         try:
-            if not self.suscripciones:
-                return
-
-            materias = self.monitor.obtener_datos_siiau()
+            # En modo distribuido se sincroniza siempre: este worker puede ser el líder.
+            # Con el feed de eventos también, aunque nadie esté suscrito. Sin
+            # suscriptores la oferta se refresca cada pocos minutos para el modo
+            # inline y /buscar, que solo leen la caché
+            if not self.suscripciones and self.fragmento is None and self.feed is None:
+                ultima = self.monitor.ultima_actualizacion
+                if ultima is not None and datetime.now() - ultima < CuposBot.VIGENCIA_SIN_SUSCRIPTORES:
+                    return
+
+            materias = await self.actualizar_materias(sondear=True)
             if not materias:
                 logger.warning("No se pudieron obtener datos de SIIAU")
                 return
 
+            await self.notificar_aperturas(context)
+
+            # Con el snapshot viejo de una caída de SIIAU no se repiten alertas
+            # cada hora: los cupos que muestra pueden ya no existir
+            if self.monitor.desactualizado:
+                logger.info("SIIAU no responde; se omiten las alertas de cupos por NRC")
+                return
+
             # Para cada usuario y sus suscripciones
             for user_id, suscripciones_usuario in self.suscripciones.items():
                 if not suscripciones_usuario:
@@ -565,6 +1478,8 @@ Este bot te ayuda a monitorear los cupos disponibles de materias en SIIAU Escola
 
                 # Verificar cada suscripción
                 for nrc, info_suscripcion in suscripciones_usuario.items():
+                    if info_suscripcion.get('tipo') == 'clave':
+                        continue
                     materia = materias.get(nrc)
                     if not materia:
                         continue
@@ -572,17 +1487,16 @@ Este bot te ayuda a monitorear los cupos disponibles de materias en SIIAU Escola
                     # Si tiene cupos y no hemos notificado recientemente
                     if (materia.tiene_cupos() and 
                         (info_suscripcion.get('last_notified') is None or 
-                         datetime.now() - info_suscripcion['last_notified'] > timedelta(hours=1))):
+                         self.reloj() - info_suscripcion['last_notified'] > timedelta(hours=1))):
                         
-                        mensaje_cupos = f"🎉 *¡ALERTA DE CUPOS!*\n\n{materia.info_cupos()}\n\n" \
-                                      f"¡Date prisa para inscribirte! 🏃‍♂️💨"
+                        mensaje_cupos = self.monitor.render(materia, 'alerta')
                         try:
                             await context.bot.send_message(
                                 chat_id=int(user_id),
                                 text=mensaje_cupos,
                                 parse_mode='Markdown'
                             )
-                            info_suscripcion['last_notified'] = datetime.now()
+                            info_suscripcion['last_notified'] = self.reloj()
                             logger.info(f"Notificación enviada a {user_id} para NRC {nrc}")
                         except Exception as e:
                             logger.error(f"Error enviando notificación a {user_id}: {e}")
@@ -592,30 +1506,250 @@ Este bot te ayuda a monitorear los cupos disponibles de materias en SIIAU Escola
         except Exception as e:
             logger.error(f"Error en monitoreo: {e}")
 
+    async def horario(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando /horario: combinaciones de secciones sin choques de horario"""
+        if not context.args:
+            await update.message.reply_text(
+                "❌ Proporciona claves o un semestre.\nEjemplo: `/horario IL355 IL356` o `/horario quinto`",
+                parse_mode='Markdown'
+            )
+            return
+
+        solo_cupos = False
+        claves = []
+        for arg in context.args:
+            codigo = arg.strip()
+            if codigo.lower() == 'cupos':
+                solo_cupos = True
+            elif codigo.lower() in MALLA:
+                claves.extend(MALLA[codigo.lower()])
+            else:
+                claves.append(codigo.upper())
+        claves = list(dict.fromkeys(claves))
+        if not claves:
+            await update.message.reply_text("❌ Proporciona al menos una clave o semestre.")
+            return
+
+        if not self.monitor.materias_cache:
+            await self.actualizar_materias()
+        secciones_por_clave = {}
+        faltantes = []
+        for clave in claves:
+            secciones = list(self.monitor.claves_cache.get(clave, {}).values())
+            if solo_cupos:
+                secciones = [c for c in secciones if c.tiene_cupos()]
+            if secciones:
+                secciones_por_clave[clave] = secciones
+            else:
+                faltantes.append(clave)
+
+        combinaciones, completo = self.monitor.horarios.combinaciones(
+            secciones_por_clave, self.monitor.versiones_nrc
+        )
+
+        mensaje = "🗓️ *Horarios sin choques*\n\n"
+        if faltantes:
+            mensaje += f"⚠️ Sin secciones{' con cupos' if solo_cupos else ''}: {', '.join(faltantes)}\n\n"
+        if not combinaciones:
+            mensaje += "❌ No hay combinaciones sin choques para esas materias."
+            await update.message.reply_text(mensaje, parse_mode='Markdown')
+            return
+
+        for i, combinacion in enumerate(combinaciones[:MAX_RESULTADOS], 1):
+            mensaje += f"*Opción {i}* ({contar_horarios(combinacion)} horarios por NRC)\n"
+            for clave, secciones in combinacion.items():
+                nrcs = ", ".join(f"`{c.getNRC()}` ({c.cupos_disponibles()})" for c in secciones[:4])
+                if len(secciones) > 4:
+                    nrcs += f" +{len(secciones) - 4}"
+                mensaje += f"• *{secciones[0].getNombre()}* - {describir_horario(secciones[0])}\n  NRC: {nrcs}\n"
+            mensaje += "\n"
+
+        total = len(combinaciones)
+        mensaje += f"📊 {total}{'+' if not completo else ''} combinaciones encontradas"
+        await update.message.reply_text(mensaje, parse_mode='Markdown')
+
+    async def notificar_aperturas(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Envía las alertas pendientes de las suscripciones por clave"""
+        aperturas, self.aperturas_pendientes = self.aperturas_pendientes, []
+        self.podar_alertas_clave()
+        for user_id, clave, materia in aperturas:
+            suscripcion = self.suscripciones.get(user_id, {}).get(clave)
+            if not suscripcion or suscripcion.get('tipo') != 'clave':
+                continue  # Se desuscribió antes de que saliera la alerta
+            ultima = self.alertas_clave.get((user_id, clave, materia.getNRC()))
+            if ultima is not None and self.reloj() - ultima <= self.ESPERA_ALERTA_CLAVE:
+                continue
+            mensaje = f"🔔 Suscripción a la clave `{clave}`\n\n" + self.monitor.render(materia, 'alerta')
+            try:
+                await context.bot.send_message(chat_id=int(user_id), text=mensaje, parse_mode='Markdown')
+                self.alertas_clave[(user_id, clave, materia.getNRC())] = self.reloj()
+                suscripcion['last_notified'] = self.reloj()
+                logger.info(f"Notificación enviada a {user_id} para clave {clave} (NRC {materia.getNRC()})")
+            except Exception as e:
+                logger.error(f"Error enviando notificación a {user_id}: {e}")
+
+    def podar_alertas_clave(self):
+        """
+        Quita las alertas que ya no frenan un reenvío: las de más de una hora y
+        las de NRCs que salieron de la oferta.
+        """
+        limite = self.reloj() - self.ESPERA_ALERTA_CLAVE
+        self.alertas_clave = {
+            llave: ultima for llave, ultima in self.alertas_clave.items()
+            if ultima > limite and llave[2] in self.monitor.materias_cache
+        }
+
+    def olvidar_alertas_clave(self, user_id, clave):
+        """Quita las alertas de una suscripción por clave que se eliminó"""
+        for llave in [l for l in self.alertas_clave if l[0] == user_id and l[1] == clave]:
+            del self.alertas_clave[llave]
+
+    async def semestre(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando /semestre: cupos agregados de un semestre de la malla"""
+        agregados = self.monitor.agregados
+        if not self.monitor.materias_cache:
+            await self.actualizar_materias()
+
+        if not context.args:
+            mensaje = "📊 *Cupos por semestre:*\n\n"
+            for nombre in agregados.malla:
+                totales = agregados.por_semestre[nombre]
+                mensaje += (f"• *{nombre}*: {len(totales['claves_abiertas'])}/{len(agregados.malla[nombre])} claves "
+                            f"con cupos, {totales['disponibles']} disponibles\n")
+            mensaje += "\nUsa `/semestre [nombre]` para ver el detalle."
+            await update.message.reply_text(mensaje, parse_mode='Markdown')
+            return
+
+        nombre = context.args[0].strip().lower()
+        if nombre not in agregados.por_semestre:
+            opciones = ", ".join(f"`{s}`" for s in agregados.por_semestre)
+            await update.message.reply_text(f"❌ Semestre no válido. Opciones: {opciones}", parse_mode='Markdown')
+            return
+
+        totales = agregados.por_semestre[nombre]
+        claves = agregados.claves(nombre)
+        mensaje = (f"📊 *Semestre {nombre}*\n\n"
+                   f"👥 Cupos disponibles: {totales['disponibles']}/{totales['cupos']} "
+                   f"({AgregadosMalla.ocupacion(totales):.1f}% ocupación)\n"
+                   f"✅ Secciones con cupos: {totales['abiertas']}/{totales['secciones']}\n"
+                   f"📚 Claves con cupos: {len(totales['claves_abiertas'])}/{len(claves)}\n")
+        if nombre != 'todo':
+            mensaje += "\n"
+            for clave in claves:
+                por_clave = agregados.por_clave.get(clave)
+                if not por_clave or not por_clave['secciones']:
+                    mensaje += f"• ⚠️ `{clave}`: sin secciones en la oferta\n"
+                    continue
+                secciones = self.monitor.claves_cache.get(clave, {})
+                materia = next(iter(secciones.values()), None)
+                titulo = materia.getNombre() if materia else clave
+                status = "✅" if por_clave['abiertas'] else "❌"
+                mensaje += (f"• {status} `{clave}` {titulo}: {por_clave['disponibles']} disp. "
+                            f"en {por_clave['abiertas']}/{por_clave['secciones']} secciones\n")
+        await update.message.reply_text(mensaje, parse_mode='Markdown')
+
+    async def resumen(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando /resumen: configura la frecuencia del resumen periódico"""
+        user_id = str(update.effective_user.id)
+        if not context.args:
+            minutos = self.resumenes.frecuencia(user_id)
+            estado = f"cada {minutos} minutos" if minutos else "desactivado"
+            await update.message.reply_text(
+                f"🕒 Tu resumen está {estado}.\nEjemplo: `/resumen 60` o `/resumen off`",
+                parse_mode='Markdown'
+            )
+            return
+
+        valor = context.args[0].strip().lower()
+        if valor in ('off', '0', 'no'):
+            minutos = 0
+        else:
+            try:
+                minutos = int(valor)
+            except ValueError:
+                minutos = -1
+            if not MotorResumen.FRECUENCIA_MINIMA <= minutos <= MotorResumen.FRECUENCIA_MAXIMA:
+                await update.message.reply_text(
+                    f"❌ La frecuencia debe estar entre {MotorResumen.FRECUENCIA_MINIMA} y "
+                    f"{MotorResumen.FRECUENCIA_MAXIMA} minutos, o `off`.",
+                    parse_mode='Markdown'
+                )
+                return
+
+        self.resumenes.configurar(user_id, minutos)
+        self.guardar_preferencias()
+        if minutos:
+            await update.message.reply_text(f"✅ Recibirás el resumen cada {minutos} minutos si hay cambios.")
+        else:
+            await update.message.reply_text("🔕 Resumen periódico desactivado.")
+
+    async def estado(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando /estado: métricas de la consulta a SIIAU y del snapshot"""
+        m = self.monitor.metricas()
+        iconos = {'cerrado': "🟢", 'semiabierto': "🟡", 'abierto': "🔴"}
+        mensaje = "🩺 *Estado del monitor*\n\n"
+        mensaje += f"{iconos.get(m['circuito'], '⚪')} SIIAU: circuito {m['circuito']}"
+        if m['circuito'] == 'abierto':
+            mensaje += f" (reintento en {m['reintento_en_s']:.0f} s)"
+        mensaje += "\n"
+        if m['antiguedad_s'] is not None:
+            mensaje += f"🕐 Última actualización: hace {m['antiguedad_s']:.0f} s"
+            mensaje += " ⚠️ _desactualizado_\n" if m['desactualizado'] else "\n"
+        mensaje += f"📚 Materias en memoria: {m['materias']} (versión {m['version']})\n"
+        mensaje += (f"📈 Consultas: {m['consultas']} | éxitos {m['exitos']} | fallos {m['fallos']} | "
+                    f"rechazadas {m['rechazadas']}\n")
+        mensaje += f"🔁 Reintentos: {m['reintentos']} | coberturas: {m['coberturas']}\n"
+        if m['latencia_p50_s'] is not None:
+            mensaje += f"⏱️ Latencia p50/p99: {m['latencia_p50_s']:.2f} s / {m['latencia_p99_s']:.2f} s\n"
+        if self.fragmento is not None:
+            rol = "líder" if self.fragmento.es_lider else "seguidor"
+            mensaje += f"🧩 Worker {self.fragmento.worker_id}/{self.fragmento.n_workers} ({rol})\n"
+        if m['ultimo_error']:
+            mensaje += f"\n❗ Último error: `{m['ultimo_error'][:200]}`"
+        await update.message.reply_text(mensaje, parse_mode='Markdown')
+
     async def resumen_suscripciones(self, context: ContextTypes.DEFAULT_TYPE) -> None:
-        """Envía cada 30 minutos el resumen de suscripciones a cada usuario"""
+        """
+        Evalúa el motor de resúmenes. Se ejecuta cada minuto y solo envía el
+        resumen a los usuarios cuya ranura inicia en este tick y cuyas
+        materias suscritas cambiaron desde su último resumen.
+        """
         try:
-            materias = self.monitor.obtener_datos_siiau()
-            for user_id, suscripciones_usuario in self.suscripciones.items():
-                mensaje = "🕒 *Resumen de tus suscripciones (cada 30 minutos):*\n\n"
+            materias = self.monitor.materias_cache
+            if not materias:
+                return
+            ahora = self.reloj()
+            activos = [user_id for user_id, subs in self.suscripciones.items() if subs]
+            cambios = self.resumenes.podar(activos)
+            for user_id, suscripciones_usuario in list(self.suscripciones.items()):
+                if not suscripciones_usuario or not self.resumenes.toca_enviar(user_id, ahora.timestamp()):
+                    continue
+                cambios = True
+                huella = MotorResumen.huella(suscripciones_usuario, self.monitor)
+                if not self.resumenes.hubo_cambios(user_id, huella):
+                    continue
+
+                minutos = self.resumenes.frecuencia(user_id)
+                mensaje = f"🕒 *Resumen de tus suscripciones (cada {minutos} minutos):*\n\n"
                 for nrc, info in suscripciones_usuario.items():
+                    if info.get('tipo') == 'clave':
+                        abiertas = self.comodines.secciones_abiertas(nrc, info, self.monitor.claves_cache)
+                        mensaje += f"• 🔔 Clave `{nrc}`: {len(abiertas)} secciones con cupos\n\n"
+                        continue
                     materia = materias.get(str(nrc))
                     if materia:
-                        status = "✅ Disponible" if materia.tiene_cupos() else "❌ Sin cupos"
-                        mensaje += (
-                            f"• *{materia.getNombre()}*\n"
-                            f"  NRC: `{materia.getNRC()}` | {status}\n"
-                            f"  Cupos: {materia.cupos_disponibles()}/{materia.cupos_totales()}\n"
-                            f"  Profesor: {materia.getProfesor()}\n\n"
-                        )
+                        mensaje += self.monitor.render(materia, 'resumen')
                     else:
                         mensaje += f"• NRC `{nrc}` no encontrado\n\n"
                 
-                mensaje += f"Actualizado: {datetime.now().strftime('%H:%M:%S')}"
+                mensaje += f"Actualizado: {ahora.strftime('%H:%M:%S')}"
                 try:
                     await context.bot.send_message(chat_id=int(user_id), text=mensaje, parse_mode='Markdown')
+                    self.resumenes.registrar_envio(user_id, huella)
                 except Exception as e:
                     logger.error(f"Error enviando resumen a {user_id}: {e}")
+            if cambios:
+                self.guardar_preferencias()
         except Exception as e:
             logger.error(f"Error en resumen de suscripciones: {e}")
 
@@ -655,13 +1789,56 @@ def shutdown_handler(signum, frame):
     logger.info("Bot detenido correctamente.")
     exit(0)
 
-signal.signal(signal.SIGINT, shutdown_handler)
-signal.signal(signal.SIGTERM, shutdown_handler)
-
 # Definir application como global para acceso en el shutdown handler
 global application
 
 # Asegurar que la instancia de application esté disponible para el shutdown handler
+def argumentos():
+    """Opciones de línea de comandos (todas opcionales)"""
+    parser = argparse.ArgumentParser(description="Bot de Telegram que monitorea cupos de SIIAU")
+    parser.add_argument('--intervalo', type=float, default=10, help="Segundos entre verificaciones de cupos")
+    parser.add_argument('--siiau-url', help="URL de la oferta con {ciclo} (por defecto SIIAU real)")
+    parser.add_argument('--telegram-api', help="URL base de la Bot API (por defecto api.telegram.org)")
+    parser.add_argument('--workers', type=int, default=1, help="Número de workers en modo distribuido")
+    parser.add_argument('--worker', type=int, default=0, help="Índice de este worker (0..workers-1)")
+    parser.add_argument('--almacen', default="almacen.sqlite", help="Base SQLite compartida entre workers")
+    parser.add_argument('--eventos', type=int, metavar='PUERTO',
+                        help="Publica los cambios de cupos como Server-Sent Events en 127.0.0.1:PUERTO")
+    return parser.parse_args()
+
+def registrar_handlers(application, bot):
+    """Registra los comandos del bot (también lo usa soak_test.py)"""
+    # Modo distribuido: reenviar a su worker los mensajes de usuarios ajenos
+    if bot.fragmento is not None:
+        application.add_handler(TypeHandler(Update, bot.reenviar_ajenos), group=-1)
+
+    # Registrar handlers
+    application.add_handler(CommandHandler('start', bot.start))
+    application.add_handler(CommandHandler('ayuda', bot.ayuda))
+    application.add_handler(CommandHandler('suscribir', bot.suscribir))
+    application.add_handler(CommandHandler('suscribir_clave', bot.suscribir_clave))
+    application.add_handler(CommandHandler('desuscribir', bot.desuscribir))
+    application.add_handler(CommandHandler('mis_suscripciones', bot.mis_suscripciones))
+    application.add_handler(CommandHandler('verificar', bot.verificar))
+    application.add_handler(CommandHandler('buscar', bot.buscar))
+    application.add_handler(CommandHandler('resumen', bot.resumen))
+    application.add_handler(CommandHandler('horario', bot.horario))
+    application.add_handler(CommandHandler('semestre', bot.semestre))
+    application.add_handler(CommandHandler('estado', bot.estado))
+    application.add_handler(InlineQueryHandler(bot.consulta_inline))
+    application.add_handler(MessageHandler(filters.COMMAND, bot.unknown))
+
+async def ejecutar_sin_polling(application):
+    """Corre solo la cola de trabajos (workers no frontales del modo distribuido)"""
+    detener = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, detener.set)
+    async with application:
+        await application.start()
+        await detener.wait()
+        await application.stop()
+
 def main():
     """
     Función principal que inicia el bot.
@@ -671,14 +1848,23 @@ def main():
     2. Configura los manejadores de comandos
     3. Configura los trabajos periódicos:
        - Monitoreo de cupos cada 10 segundos
-       - Resumen de suscripciones cada 30 minutos
+       - Motor de resúmenes cada minuto (cada usuario elige su frecuencia)
     4. Inicia el bot en modo polling
     
+    Con --workers N > 1 corre como uno de N workers (ver sharding.py): solo
+    el worker frontal (0) hace polling a Telegram y solo el que tiene el lease
+    consulta SIIAU.
+    
     Requisitos:
     - Archivo token.txt con el token del bot
     - Permisos de escritura para suscripciones.json
     """
     global application  # Declarar application como global
+    global bot  # Lo usa enviar_mensaje_cierre
+    global SIIAU_URL
+    args = argumentos()
+    if args.siiau_url:
+        SIIAU_URL = args.siiau_url
     try:
         # Leer el token del bot desde archivo
         with open('token.txt', 'r') as f:
@@ -689,23 +1875,38 @@ def main():
 
     try:
         # Crear bot y aplicación
-        application = ApplicationBuilder().token(token).build()
-        bot = CuposBot()
-
-        # Registrar handlers
-        application.add_handler(CommandHandler('start', bot.start))
-        application.add_handler(CommandHandler('ayuda', bot.ayuda))
-        application.add_handler(CommandHandler('suscribir', bot.suscribir))
-        application.add_handler(CommandHandler('desuscribir', bot.desuscribir))
-        application.add_handler(CommandHandler('mis_suscripciones', bot.mis_suscripciones))
-        application.add_handler(CommandHandler('verificar', bot.verificar))
-        application.add_handler(CommandHandler('buscar', bot.buscar))
-        application.add_handler(MessageHandler(filters.COMMAND, bot.unknown))
+        builder = ApplicationBuilder().token(token)
+        if args.telegram_api:
+            builder = builder.base_url(args.telegram_api)
+        application = builder.build()
+        fragmento = None
+        if args.workers > 1:
+            from sharding import MARGEN_LEASE, Fragmento
+            # El lease debe sobrevivir a una consulta completa a SIIAU con reintentos
+            ttl = max(3 * args.intervalo, PRESUPUESTO + MARGEN_LEASE)
+            fragmento = Fragmento(args.worker, args.workers, args.almacen, ttl=ttl)
+        bot = CuposBot(fragmento)
+        # Se registran aquí y no al importar el módulo: el manejador usa
+        # application y bot, que solo existen desde este punto
+        signal.signal(signal.SIGINT, shutdown_handler)
+        signal.signal(signal.SIGTERM, shutdown_handler)
+
+        # Feed local de cambios (en modo distribuido, solo en el worker frontal)
+        if args.eventos is not None and (fragmento is None or fragmento.frontal):
+            from events import FeedEventos, ServidorEventos
+            bot.feed = FeedEventos()
+            bot.monitor.agregar_oyente(bot.feed.registrar)
+            ServidorEventos(bot.feed, bot.monitor, args.eventos).iniciar()
+
+        registrar_handlers(application, bot)
 
         # Configurar job para monitoreo
         job_queue = application.job_queue
-        job_queue.run_repeating(bot.monitorear_cupos, interval=10, first=10)  # Actualiza cada 10 segundos
-        job_queue.run_repeating(bot.resumen_suscripciones, interval=1800, first=30)  # Envía resumen cada 30 minutos
+        # El primer ciclo corre al arrancar para que el modo inline tenga oferta desde el inicio
+        job_queue.run_repeating(bot.monitorear_cupos, interval=args.intervalo, first=1)  # Actualiza cada 10 segundos
+        if fragmento is not None:
+            job_queue.run_repeating(bot.procesar_operaciones, interval=1, first=1)
+        job_queue.run_repeating(bot.resumen_suscripciones, interval=MotorResumen.INTERVALO_TICK, first=30)  # Resúmenes escalonados por usuario
 
         # Función para enviar mensaje de inicio
         async def enviar_mensaje_inicio(context):
@@ -720,7 +1921,7 @@ def main():
                     await context.bot.send_message(
                         chat_id=admin_id,
                         text="✅ *Bot de monitoreo SIIAU iniciado correctamente*\n\n" \
-                             "🔄 Intervalo de monitoreo: 10 segundos\n" \
+                             f"🔄 Intervalo de monitoreo: {args.intervalo:g} segundos\n" \
                              "📚 Ciclo: 202520 (fijo)",
                         parse_mode='Markdown'
                     )
@@ -732,7 +1933,10 @@ def main():
 
         # Iniciar bot
         logger.info("Bot iniciado. Presiona Ctrl+C para detener.")
-        application.run_polling(drop_pending_updates=True)
+        if fragmento is not None and not fragmento.frontal:
+            asyncio.run(ejecutar_sin_polling(application))
+        else:
+            application.run_polling(drop_pending_updates=True)
 
     except Exception as e:
         logger.error(f"Error iniciando el bot: {e}")
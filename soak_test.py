@@ -0,0 +1,234 @@
+"""
+Prueba de resistencia (soak test) del ciclo completo de CuposBot.
+
+Corre en un solo proceso el mismo ciclo que main(): monitorear_cupos cada
+--intervalo segundos simulados, resumen_suscripciones cada minuto simulado y
+comandos de usuarios (suscribir, desuscribir, buscar, ...) que pasan por los
+handlers reales. SIIAU y la Bot API son los servidores falsos de
+fake_services.py. El tiempo va acelerado: el reloj del bot (bot.reloj) avanza
+un intervalo por tick y los ticks corren uno tras otro, así que horas
+simuladas toman minutos.
+
+Cada --cada ticks se toma un snapshot de tracemalloc y se calculan los
+percentiles de latencia de la ventana. Las latencias se miden con tracemalloc
+activo, que hace el parseo de la oferta varias veces más lento; los límites
+por defecto lo consideran y la deriva entre ventanas no se ve afectada.
+
+La prueba falla (código de salida 1) si:
+- la memoria crece más de --max-crecimiento-mb desde el fin del calentamiento,
+- el p99 de los ticks pasa de --max-p99-ms, o
+- el p99 del último cuarto de la prueba es más de --max-deriva veces el del primero.
+
+Ejemplo (6 horas simuladas):
+    python soak_test.py --horas 6 --usuarios 300
+"""
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from telegram import Update
+from telegram.ext import ApplicationBuilder, CallbackContext
+
+import siiau_monitor_bot
+from fake_services import ServidorSIIAUFalso, ServidorTelegramFalso, update_comando
+from resilience import percentil
+from siiau_monitor_bot import CuposBot, MotorResumen, registrar_handlers
+
+PISO_DERIVA_MS = 5      # Debajo de este p99 las variaciones son ruido y no cuentan como deriva
+TOP_CRECIMIENTO = 10    # Líneas de código con más crecimiento que se reportan
+OBJETIVO_SUSCRIPCIONES = 3  # Suscripciones alrededor de las que oscila cada usuario simulado
+
+
+def comandos_aleatorios(rng, usuarios, suscripciones, nrcs, claves, probabilidad):
+    """
+    Comandos que escriben los usuarios simulados en un tick. Cada alta o baja
+    acerca al usuario a OBJETIVO_SUSCRIPCIONES (al llegar, alterna entre una
+    más y una menos), así el total de suscripciones se queda estable y la
+    deriva de latencia no viene de una carga que crece.
+    """
+    comandos = []
+    for user_id in usuarios:
+        if rng.random() >= probabilidad:
+            continue
+        opcion = rng.random()
+        propias = list(suscripciones.get(user_id, {}))
+        if opcion < 0.7:
+            faltan = OBJETIVO_SUSCRIPCIONES - len(propias)
+            if faltan > 0 or (faltan == 0 and rng.random() < 0.5):
+                if rng.random() < 0.15:
+                    texto = f"/suscribir_clave {rng.choice(claves)}"
+                else:
+                    texto = f"/suscribir {rng.choice(nrcs)}"
+            else:
+                texto = f"/desuscribir {rng.choice(propias)}"
+        elif opcion < 0.85:
+            texto = "/mis_suscripciones"
+        elif opcion < 0.95:
+            texto = f"/buscar {rng.choice(claves)}"
+        else:
+            texto = f"/resumen {rng.choice([10, 30, 60, 'off'])}"
+        comandos.append((user_id, texto))
+    return comandos
+
+
+def tomar_snapshot():
+    """Snapshot sin la basura pendiente del recolector, para que las mediciones sean comparables"""
+    gc.collect()
+    return filtrar(tracemalloc.take_snapshot())
+
+
+def memoria_mb(snapshot):
+    return sum(stat.size for stat in snapshot.statistics('filename')) / 2 ** 20
+
+
+def filtrar(snapshot):
+    """Quita del snapshot lo que reservan tracemalloc y los servidores falsos (no son del bot)"""
+    return snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "*/fake_services.py"),
+        tracemalloc.Filter(False, "*/http/server.py"),
+        tracemalloc.Filter(False, "*/socketserver.py"),
+    ])
+
+
+async def correr(args):
+    rng = random.Random(args.semilla)
+    siiau = ServidorSIIAUFalso(secciones=args.secciones, claves=max(10, args.secciones // 10),
+                               cambios=args.cambios, semilla=args.semilla).iniciar()
+    telegram = ServidorTelegramFalso().iniciar()
+    siiau_monitor_bot.SIIAU_URL = siiau.url + "/oferta?ciclop={ciclo}"
+
+    application = ApplicationBuilder().token("123456:SOAK").base_url(f"{telegram.url}/bot").build()
+    bot = CuposBot()
+    ahora = [datetime.now()]
+    bot.reloj = lambda: ahora[0]
+    registrar_handlers(application, bot)
+
+    nrcs = [f['nrc'] for f in siiau.filas]
+    claves = sorted({f['clave'] for f in siiau.filas})
+    usuarios = [str(100000 + u) for u in range(args.usuarios)]
+    ticks = int(args.horas * 3600 / args.intervalo)
+    ticks_resumen = max(1, round(MotorResumen.INTERVALO_TICK / args.intervalo))
+    calentamiento = max(args.cada, ticks // 10)
+
+    latencias = []          # Segundos por tick
+    ventanas = []           # [(tick, memoria MB, p50 ms, p99 ms)]
+    inicio_ventana = 0
+    base = None
+    mensajes = 0
+    siguiente_update = 1
+
+    tracemalloc.start(args.profundidad)
+    async with application:
+        contexto = CallbackContext(application)
+        # Los usuarios empiezan con sus suscripciones para que la carga sea
+        # estable desde el primer tick
+        await bot.monitorear_cupos(contexto)
+        for user_id in usuarios:
+            texto = "/suscribir " + " ".join(rng.sample(nrcs, OBJETIVO_SUSCRIPCIONES))
+            await application.process_update(
+                Update.de_json(update_comando(siguiente_update, user_id, texto), application.bot)
+            )
+            siguiente_update += 1
+        for tick in range(1, ticks + 1):
+            ahora[0] += timedelta(seconds=args.intervalo)
+            inicio = time.perf_counter()
+            for user_id, texto in comandos_aleatorios(rng, usuarios, bot.suscripciones, nrcs, claves, args.comandos):
+                await application.process_update(
+                    Update.de_json(update_comando(siguiente_update, user_id, texto), application.bot)
+                )
+                siguiente_update += 1
+            await bot.monitorear_cupos(contexto)
+            if tick % ticks_resumen == 0:
+                await bot.resumen_suscripciones(contexto)
+            latencias.append(time.perf_counter() - inicio)
+
+            # Los mensajes recibidos por la Bot API falsa no son memoria del bot
+            with telegram.lock:
+                mensajes += len(telegram.enviados)
+                telegram.enviados.clear()
+
+            if tick == calentamiento:
+                base = tomar_snapshot()
+                inicio_ventana = tick
+            elif base is not None and (tick - calentamiento) % args.cada == 0:
+                ventana = [t * 1000 for t in latencias[inicio_ventana:tick]]
+                memoria = memoria_mb(tomar_snapshot())
+                ventanas.append((tick, memoria, percentil(ventana, 0.5), percentil(ventana, 0.99)))
+                inicio_ventana = tick
+                print(f"tick {tick:>6}/{ticks} ({tick * args.intervalo / 3600:5.2f} h simuladas) | "
+                      f"memoria {memoria:7.2f} MB | p50 {ventanas[-1][2]:6.1f} ms | p99 {ventanas[-1][3]:6.1f} ms | "
+                      f"suscripciones {sum(len(s) for s in bot.suscripciones.values())}", flush=True)
+        final = tomar_snapshot()
+    tracemalloc.stop()
+    siiau.detener()
+    telegram.detener()
+
+    if base is None or not ventanas:
+        print("FALLO: la prueba es muy corta para tener ventanas después del calentamiento")
+        return 1
+
+    crecimiento = memoria_mb(final) - memoria_mb(base)
+    medidas = [t * 1000 for t in latencias[calentamiento:]]
+    p50, p99 = percentil(medidas, 0.5), percentil(medidas, 0.99)
+    # La deriva compara el primer y el último cuarto de la prueba: una ventana
+    # de pocos ticks tiene un p99 que es casi su máximo
+    cuarto = max(1, len(medidas) // 4)
+    p99_inicio, p99_fin = percentil(medidas[:cuarto], 0.99), percentil(medidas[-cuarto:], 0.99)
+    deriva = p99_fin / p99_inicio if p99_inicio else 1.0
+
+    print(f"\nTicks: {ticks} ({args.horas:g} h simuladas de {args.intervalo:g} s), "
+          f"consultas a SIIAU: {siiau.peticiones}, mensajes enviados: {mensajes}")
+    print(f"Memoria: {memoria_mb(base):.2f} MB -> {memoria_mb(final):.2f} MB "
+          f"(crecimiento {crecimiento:+.2f} MB, límite {args.max_crecimiento_mb:g} MB)")
+    print(f"Latencia por tick: p50 {p50:.1f} ms, p99 {p99:.1f} ms (límite {args.max_p99_ms:g} ms)")
+    print(f"Deriva del p99 (último/primer cuarto): {p99_inicio:.1f} ms -> {p99_fin:.1f} ms, "
+          f"{deriva:.2f}x (límite {args.max_deriva:g}x)")
+    print("\nLíneas con más crecimiento de memoria desde el calentamiento:")
+    for stat in final.compare_to(base, 'lineno')[:TOP_CRECIMIENTO]:
+        print(f"  {stat}")
+
+    fallos = []
+    if crecimiento > args.max_crecimiento_mb:
+        fallos.append("crecimiento de memoria")
+    if p99 > args.max_p99_ms:
+        fallos.append("p99 de latencia")
+    if p99_fin > PISO_DERIVA_MS and deriva > args.max_deriva:
+        fallos.append("deriva de latencia")
+    print("\nOK" if not fallos else f"\nFALLO: {', '.join(fallos)}")
+    return 1 if fallos else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de resistencia del bot con tiempo acelerado")
+    parser.add_argument('--horas', type=float, default=2, help="Horas simuladas")
+    parser.add_argument('--intervalo', type=float, default=10, help="Segundos simulados por tick de monitoreo")
+    parser.add_argument('--secciones', type=int, default=300, help="Secciones de la oferta falsa")
+    parser.add_argument('--usuarios', type=int, default=200)
+    parser.add_argument('--comandos', type=float, default=0.01, help="Probabilidad de que un usuario escriba un comando por tick")
+    parser.add_argument('--cambios', type=float, default=0.02, help="Fracción de secciones que cambian por consulta")
+    parser.add_argument('--cada', type=int, default=60, help="Ticks entre snapshots de memoria")
+    parser.add_argument('--profundidad', type=int, default=1, help="Marcos guardados por tracemalloc")
+    parser.add_argument('--max-crecimiento-mb', type=float, default=20)
+    parser.add_argument('--max-p99-ms', type=float, default=5000)
+    parser.add_argument('--max-deriva', type=float, default=2.0)
+    parser.add_argument('--semilla', type=int, default=1)
+    args = parser.parse_args()
+
+    # El bot guarda suscripciones.json y preferencias.json en el directorio actual
+    os.chdir(tempfile.mkdtemp(prefix="siiaubot-soak-"))
+    logging.getLogger().setLevel(logging.WARNING)
+    return asyncio.run(correr(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
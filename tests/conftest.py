@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pytest
+
+# Los módulos del bot viven en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def fila(nrc, clave='IL355', nombre='ALGEBRA', cup=30, dis=0, sesiones=(('0700-0855', 'L . I . . .'),),
+         profesor='PROFESOR 1'):
+    """Fila de la oferta con el formato que extrae ParserUDG de SIIAU"""
+    horario = [['01', hora, dias, 'DEDX', 'A001', '01/08/25 - 01/12/25'] for hora, dias in sesiones]
+    return ['CUCEI', str(nrc), clave, nombre, 'D01', '8', str(cup), str(dis), horario, [['01', profesor]]]
+
+
+def snapshot(filas):
+    """{nrc: Clase} como lo entrega BaseDatos después de descargar la oferta"""
+    from siiau_monitor_bot import BaseDatos
+    return BaseDatos(datos=filas).NRCDict
+
+
+class BotFalso:
+    """Reemplaza a context.bot: guarda los mensajes en lugar de enviarlos"""
+
+    def __init__(self):
+        self.enviados = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.enviados.append((str(chat_id), text))
+
+
+class Contexto:
+    def __init__(self, *args):
+        self.bot = BotFalso()
+        self.args = list(args)
+
+
+class UpdateFalso:
+    """Update de un comando: las respuestas quedan en respuestas"""
+
+    def __init__(self, user_id):
+        self.respuestas = []
+        self.effective_user = type('Usuario', (), {'id': user_id})()
+        self.message = self
+
+    async def reply_text(self, text, **kwargs):
+        self.respuestas.append(text)
+
+
+@pytest.fixture
+def bot(tmp_path, monkeypatch):
+    """CuposBot que guarda sus archivos JSON en un directorio temporal"""
+    from siiau_monitor_bot import CuposBot
+    monkeypatch.chdir(tmp_path)
+    return CuposBot()
@@ -0,0 +1,79 @@
+import random
+
+from conftest import fila
+from database import MALLA
+from siiau_monitor_bot import AgregadosMalla, BaseDatos, SiiauMonitor
+
+# IL345 aparece dos veces en el segundo semestre; XX999 no está en la malla
+CLAVES = ['IL345', 'IL355', 'I5288', 'IL360', 'XX999']
+
+
+def snapshot(filas):
+    return BaseDatos(datos=filas).NRCDict
+
+
+def recalcular(materias):
+    """Totales calculados desde cero sobre toda la oferta"""
+    por_clave = {}
+    for clase in materias.values():
+        totales = por_clave.setdefault(clase.getClave(), AgregadosMalla.totales_vacios())
+        totales['cupos'] += clase.cupos_totales()
+        totales['disponibles'] += clase.cupos_disponibles()
+        totales['secciones'] += 1
+        totales['abiertas'] += 1 if clase.tiene_cupos() else 0
+    por_semestre = {}
+    for semestre, claves in list(MALLA.items()) + [('todo', list(por_clave))]:
+        agregado = AgregadosMalla.totales_vacios()
+        agregado['claves_abiertas'] = set()
+        for clave in dict.fromkeys(claves):
+            totales = por_clave.get(clave)
+            if totales is None:
+                continue
+            for campo in ('cupos', 'disponibles', 'secciones', 'abiertas'):
+                agregado[campo] += totales[campo]
+            if totales['abiertas']:
+                agregado['claves_abiertas'].add(clave)
+        por_semestre[semestre] = agregado
+    return por_clave, por_semestre
+
+
+def test_incremental_igual_a_recalcular():
+    rng = random.Random(11)
+    monitor = SiiauMonitor()
+    filas = {}
+    for paso in range(30):
+        # Cambios de cupos, altas, bajas y NRCs que cambian de clave
+        for nrc in rng.sample(range(100, 140), rng.randint(3, 12)):
+            if nrc in filas and rng.random() < 0.35:
+                del filas[nrc]
+            else:
+                cupos = rng.randint(0, 40)
+                filas[nrc] = fila(nrc, clave=rng.choice(CLAVES), cup=cupos, dis=rng.randint(0, cupos))
+        monitor.aplicar_snapshot(snapshot(list(filas.values())))
+
+        por_clave, por_semestre = recalcular(monitor.materias_cache)
+        agregados = monitor.agregados
+        assert agregados.por_clave == por_clave, f"paso {paso}"
+        assert agregados.por_semestre == por_semestre, f"paso {paso}"
+        assert sorted(agregados.claves('todo')) == sorted(por_clave)
+
+
+def test_cambio_de_clave_mueve_los_totales():
+    monitor = SiiauMonitor()
+    monitor.aplicar_snapshot(snapshot([fila(1, clave='IL355', cup=30, dis=5), fila(2, clave='IL355', cup=20, dis=0)]))
+    assert monitor.agregados.por_clave['IL355']['secciones'] == 2
+
+    monitor.aplicar_snapshot(snapshot([fila(1, clave='IL360', cup=30, dis=5), fila(2, clave='IL355', cup=20, dis=0)]))
+    agregados = monitor.agregados
+    assert agregados.por_clave['IL355'] == {'cupos': 20, 'disponibles': 0, 'secciones': 1, 'abiertas': 0}
+    assert agregados.por_clave['IL360'] == {'cupos': 30, 'disponibles': 5, 'secciones': 1, 'abiertas': 1}
+    assert 'IL355' not in agregados.por_semestre['quinto']['claves_abiertas']
+    assert agregados.por_semestre['noveno']['claves_abiertas'] == {'IL360'}
+
+
+def test_clave_sin_secciones_sale_de_todo():
+    monitor = SiiauMonitor()
+    monitor.aplicar_snapshot(snapshot([fila(1, clave='IL355'), fila(2, clave='XX999')]))
+    monitor.aplicar_snapshot(snapshot([fila(1, clave='IL355')]))
+    assert monitor.agregados.claves('todo') == ['IL355']
+    assert monitor.agregados.por_semestre['todo']['secciones'] == 1
@@ -0,0 +1,79 @@
+import asyncio
+
+from conftest import Contexto, UpdateFalso, fila, snapshot
+from siiau_monitor_bot import CuposBot, IndiceComodines
+
+
+def suscribir_clave(bot, user_id, *args):
+    update = UpdateFalso(user_id)
+    asyncio.run(bot.suscribir_clave(update, Contexto(*args)))
+    return update.respuestas[-1]
+
+
+def aperturas(bot, filas):
+    bot.aperturas_pendientes = []
+    bot.monitor.aplicar_snapshot(snapshot(filas))
+    return [(user_id, clave, clase.getNRC()) for user_id, clave, clase in bot.aperturas_pendientes]
+
+
+BASE = [fila(1001, dis=0), fila(1002, dis=3), fila(2001, clave='IL360', nombre='REDES', dis=0)]
+
+
+def test_snapshot_inicial_no_notifica(bot):
+    info = CuposBot.nueva_suscripcion_clave('IL355', 'ALGEBRA', {})
+    bot.suscripciones['7'] = {'IL355': info}
+    bot.comodines.agregar('7', 'IL355', info)
+    # Todas las secciones son "nuevas" en el primer snapshot
+    assert aperturas(bot, BASE) == []
+
+
+def test_seccion_nueva_y_apertura_de_la_clave(bot):
+    bot.monitor.aplicar_snapshot(snapshot(BASE))
+    suscribir_clave(bot, 7, 'IL355')
+
+    # Sección nueva con cupos, sección nueva sin cupos y sección nueva de otra clave
+    nuevas = BASE + [fila(1003, dis=2), fila(1004, dis=0), fila(2002, clave='IL360', nombre='REDES', dis=4)]
+    assert aperturas(bot, nuevas) == [('7', 'IL355', '1003')]
+
+    # 1001 pasa de 0 a 5 (abre); 1002 ya tenía cupos y solo cambia de 3 a 1
+    cambios = [fila(1001, dis=5), fila(1002, dis=1)] + nuevas[2:]
+    assert aperturas(bot, cambios) == [('7', 'IL355', '1001')]
+
+    contexto = Contexto()
+    asyncio.run(bot.notificar_aperturas(contexto))
+    assert [chat for chat, _ in contexto.bot.enviados] == ['7']
+    assert 'IL355' in contexto.bot.enviados[0][1]
+
+
+def test_filtros_de_profesor_y_hora(bot):
+    bot.monitor.aplicar_snapshot(snapshot(BASE))
+    suscribir_clave(bot, 7, 'IL355', 'profesor:perez')
+    suscribir_clave(bot, 8, 'IL355', 'hora:1100')
+    nuevas = BASE + [
+        fila(1005, dis=2, profesor='JUAN PEREZ LOPEZ', sesiones=(('0700-0855', 'L . I . . .'),)),
+        fila(1006, dis=2, profesor='ANA GARCIA', sesiones=(('1100-1255', '. M . J . .'),)),
+        fila(1007, dis=2, profesor='LUIS DIAZ', sesiones=(('1300-1455', 'L . I . . .'),)),
+    ]
+    assert sorted(aperturas(bot, nuevas)) == [('7', 'IL355', '1005'), ('8', 'IL355', '1006')]
+
+    info = bot.suscripciones['7']['IL355']
+    clases = bot.monitor.materias_cache
+    assert IndiceComodines.cumple_filtros(clases['1005'], info)
+    assert not IndiceComodines.cumple_filtros(clases['1006'], info)
+
+
+def test_desuscribir_limpia_el_indice(bot):
+    bot.monitor.aplicar_snapshot(snapshot(BASE))
+    suscribir_clave(bot, 7, 'IL355')
+    suscribir_clave(bot, 8, 'IL355')
+    assert set(bot.comodines.por_clave['IL355']) == {'7', '8'}
+
+    asyncio.run(bot.desuscribir(UpdateFalso(7), Contexto('IL355')))
+    assert set(bot.comodines.por_clave['IL355']) == {'8'}
+    asyncio.run(bot.desuscribir(UpdateFalso(8), Contexto('IL355')))
+    assert bot.comodines.por_clave == {}
+    assert aperturas(bot, BASE + [fila(1003, dis=2)]) == []
+
+    # Al recargar las suscripciones el índice no revive la clave
+    bot.comodines.reconstruir(bot.suscripciones)
+    assert bot.comodines.por_clave == {}
@@ -0,0 +1,68 @@
+from conftest import fila, snapshot
+from siiau_monitor_bot import CacheConsultas, SiiauMonitor
+
+TEXTOS = [('algebra lineal il355 1001', '1001'), ('algoritmos il356 1002', '1002'),
+          ('calculo il360 1003', '1003'), ('algebra superior il357 1004', '1004')]
+
+
+class Catalogo:
+    def __init__(self, textos=TEXTOS):
+        self.textos = textos
+        self.llamadas = 0
+
+    def __call__(self):
+        self.llamadas += 1
+        return self.textos
+
+
+def nrcs(resultado):
+    return [nrc for _, nrc in resultado]
+
+
+def test_prefijo_acota_la_busqueda():
+    cache, catalogo = CacheConsultas(), Catalogo()
+    assert nrcs(cache.buscar('alg', 1, catalogo)) == ['1001', '1002', '1004']
+    # 'alge' se filtra sobre el resultado de 'alg', sin volver al catálogo
+    assert nrcs(cache.buscar('alge', 1, catalogo)) == ['1001', '1004']
+    assert nrcs(cache.buscar('algebra s', 1, catalogo)) == ['1004']
+    assert catalogo.llamadas == 1
+    assert nrcs(cache.buscar('alge', 1, catalogo)) == ['1001', '1004']
+    assert (cache.aciertos, cache.fallos) == (1, 3)
+    # Sin un prefijo en cache se recorre el catálogo
+    assert nrcs(cache.buscar('calc', 1, catalogo)) == ['1003']
+    assert catalogo.llamadas == 2
+
+
+def test_desalojo_lru():
+    cache, catalogo = CacheConsultas(capacidad=2), Catalogo()
+    cache.buscar('il355', 1, catalogo)
+    cache.buscar('il356', 1, catalogo)
+    cache.buscar('il355', 1, catalogo)  # Pasa a ser la más reciente
+    cache.buscar('il360', 1, catalogo)
+    assert list(cache.entradas) == ['il355', 'il360']
+
+
+def test_cambio_de_version_invalida():
+    cache, catalogo = CacheConsultas(), Catalogo()
+    cache.buscar('alg', 1, catalogo)
+    catalogo.textos = TEXTOS[:1]
+    assert nrcs(cache.buscar('alg', 1, catalogo)) == ['1001', '1002', '1004']
+    assert nrcs(cache.buscar('alg', 2, catalogo)) == ['1001']
+    assert list(cache.entradas) == ['alg'] and catalogo.llamadas == 2
+
+
+def test_cambio_de_cupos_no_reconstruye_el_catalogo():
+    monitor = SiiauMonitor()
+    monitor.aplicar_snapshot(snapshot([fila(1001, dis=0), fila(1002, clave='IL360', nombre='REDES')]))
+    assert [c.getNRC() for c in monitor.buscar_texto('algeb')] == ['1001']
+    textos = monitor.catalogo()
+
+    monitor.aplicar_snapshot(snapshot([fila(1001, dis=7), fila(1002, clave='IL360', nombre='REDES')]))
+    assert monitor.catalogo() is textos
+    # El resultado en cache trae la Clase del snapshot nuevo
+    assert [c.cupos_disponibles() for c in monitor.buscar_texto('algeb')] == [7]
+
+    # Una sección nueva sí cambia la estructura
+    monitor.aplicar_snapshot(snapshot([fila(1001, dis=7), fila(1002, clave='IL360', nombre='REDES'), fila(1003)]))
+    assert monitor.catalogo() is not textos
+    assert [c.getNRC() for c in monitor.buscar_texto('algeb')] == ['1001', '1003']
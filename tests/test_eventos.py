@@ -0,0 +1,76 @@
+import pytest
+
+from conftest import fila, snapshot
+from events import FeedEventos
+
+
+def publicar(feed, *cambios):
+    """Publica un diff con un cambio de DIS por cada (nrc, dis_anterior, dis_nuevo)"""
+    diff = {}
+    for nrc, antes, despues in cambios:
+        diff[str(nrc)] = (snapshot([fila(nrc, dis=antes)])[str(nrc)], snapshot([fila(nrc, dis=despues)])[str(nrc)])
+    feed.registrar(diff, inicial=False)
+
+
+def secuencias(eventos):
+    return [e['seq'] for e in eventos]
+
+
+def test_snapshot_inicial_y_cambios_sin_dis_no_publican():
+    feed = FeedEventos(arranque='a')
+    feed.registrar({'1001': (None, snapshot([fila(1001)])['1001'])}, inicial=True)
+    publicar(feed, (1001, 3, 3))
+    assert feed.seq == 0 and not feed.eventos
+
+
+def test_reanuda_desde_el_ultimo_id():
+    feed = FeedEventos(arranque='a')
+    publicar(feed, (1001, 0, 2), (1002, 5, 4))
+    publicar(feed, (1001, 2, 1))
+    assert feed.desde('a', 0) == (False, list(feed.eventos))
+    reset, eventos = feed.desde('a', 2)
+    assert not reset and secuencias(eventos) == [3]
+    assert eventos[0]['nrc'] == '1001' and (eventos[0]['dis_anterior'], eventos[0]['dis_nuevo']) == (2, 1)
+    assert feed.desde('a', 3) == (False, [])
+
+
+def test_reset_cuando_los_eventos_salieron_del_buffer():
+    feed = FeedEventos(capacidad=3, arranque='a')
+    for dis in range(5):
+        publicar(feed, (1001, dis, dis + 1))
+    assert secuencias(feed.eventos) == [3, 4, 5]
+    # Faltan el 2 (y el 1)
+    reset, eventos = feed.desde('a', 1)
+    assert reset and secuencias(eventos) == [3, 4, 5]
+    # Con el 2 ya aplicado no falta nada
+    assert feed.desde('a', 2) == (False, list(feed.eventos))
+
+
+def test_reset_con_id_de_otra_ejecucion():
+    anterior = FeedEventos(arranque='viejo')
+    for dis in range(100):
+        publicar(anterior, (1001, dis, dis + 1))
+    ultimo_id = anterior.id_evento(anterior.seq)
+    assert ultimo_id == 'viejo-100'
+
+    # La nueva ejecución ya pasó de la secuencia 100: sin el arranque parecería reanudable
+    feed = FeedEventos(arranque='nuevo')
+    for dis in range(150):
+        publicar(feed, (1001, dis, dis + 1))
+    reset, eventos = feed.desde(*FeedEventos.leer_id(ultimo_id))
+    assert reset
+    # Un id sin arranque (formato anterior) tampoco se puede reanudar
+    assert feed.desde(*FeedEventos.leer_id('100'))[0]
+    # Por arriba de la secuencia actual sigue siendo reset
+    assert feed.desde('nuevo', 151)[0]
+
+
+def test_leer_id():
+    assert FeedEventos.leer_id('3f2a9c1e-42') == ('3f2a9c1e', 42)
+    assert FeedEventos.leer_id('42') == (None, 42)
+    with pytest.raises(ValueError):
+        FeedEventos.leer_id('basura')
+
+
+def test_cada_feed_tiene_su_arranque():
+    assert FeedEventos().arranque != FeedEventos().arranque
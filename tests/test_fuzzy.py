@@ -0,0 +1,26 @@
+import random
+
+from conftest import fila
+from fuzzy import IndiceDifuso, distancia
+from siiau_monitor_bot import BaseDatos
+
+
+def test_distancia_con_tope_coincide_con_la_completa():
+    rng = random.Random(3)
+    for _ in range(3000):
+        a = "".join(rng.choice('abc ') for _ in range(rng.randint(0, 12)))
+        b = "".join(rng.choice('abc ') for _ in range(rng.randint(0, 12)))
+        tope = rng.randint(0, 4)
+        completa = distancia(a, b)
+        assert distancia(a, b, tope) == (completa if completa <= tope else tope + 1)
+
+
+def test_sugiere_nombre_entre_nombres_parecidos():
+    palabras = ['CALCULO', 'ALGEBRA', 'LINEAL', 'DIFERENCIAL', 'INTEGRAL', 'FISICA', 'REDES', 'DATOS']
+    rng = random.Random(5)
+    filas = [fila(1000 + k, clave=f"I{k:04d}", nombre=" ".join(rng.sample(palabras, 3)) + f" {k}")
+             for k in range(2000)]
+    indice = IndiceDifuso(BaseDatos(datos=filas).NRCDict)
+    nombre = filas[1234][3]
+    consulta = nombre[:4] + 'X' + nombre[5:]
+    assert 'I1234' in [clave for _, _, clave in indice.sugerir_nombre(consulta)]
@@ -0,0 +1,126 @@
+import pytest
+
+import resilience
+from resilience import ClienteSIIAU, CircuitoAbierto, ErrorSIIAU, InterruptorCircuito
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 0.0
+
+    def __call__(self):
+        return self.ahora
+
+
+@pytest.fixture
+def reloj():
+    return Reloj()
+
+
+@pytest.fixture
+def sin_esperas(monkeypatch):
+    # Backoff sin esperas reales
+    monkeypatch.setattr(resilience.random, 'uniform', lambda a, b: 0)
+
+
+def cliente_con(respuestas, reloj, reintentos=0):
+    """ClienteSIIAU cuyas peticiones devuelven (o lanzan) respuestas en orden"""
+    cliente = ClienteSIIAU(reintentos=reintentos, interruptor=InterruptorCircuito(umbral=3, enfriamiento=60, reloj=reloj))
+    pendientes = list(respuestas)
+
+    def con_cobertura(url, timeout):
+        cliente.contadores['peticiones'] += 1
+        respuesta = pendientes.pop(0)
+        if isinstance(respuesta, Exception):
+            raise respuesta
+        return respuesta
+
+    cliente._con_cobertura = con_cobertura
+    return cliente
+
+
+def test_abre_tras_el_umbral_de_fallos(reloj):
+    interruptor = InterruptorCircuito(umbral=3, enfriamiento=60, reloj=reloj)
+    for _ in range(2):
+        assert interruptor.permite()
+        interruptor.fallo()
+    assert interruptor.estado == InterruptorCircuito.CERRADO
+    interruptor.fallo()
+    assert interruptor.estado == InterruptorCircuito.ABIERTO
+    assert interruptor.aperturas == 1
+    assert not interruptor.permite()
+
+
+def test_un_exito_reinicia_la_cuenta(reloj):
+    interruptor = InterruptorCircuito(umbral=3, enfriamiento=60, reloj=reloj)
+    interruptor.fallo()
+    interruptor.fallo()
+    interruptor.exito()
+    interruptor.fallo()
+    assert interruptor.estado == InterruptorCircuito.CERRADO
+
+
+def test_semiabierto_permite_una_sola_prueba(reloj):
+    interruptor = InterruptorCircuito(umbral=1, enfriamiento=60, reloj=reloj)
+    interruptor.fallo()
+    reloj.ahora = 59.9
+    assert not interruptor.permite()
+    reloj.ahora = 60
+    assert interruptor.estado == InterruptorCircuito.SEMIABIERTO
+    assert interruptor.permite()
+    assert not interruptor.permite()
+    interruptor.exito()
+    assert interruptor.estado == InterruptorCircuito.CERRADO
+    assert interruptor.permite() and interruptor.permite()
+
+
+def test_prueba_fallida_reabre(reloj):
+    interruptor = InterruptorCircuito(umbral=3, enfriamiento=60, reloj=reloj)
+    for _ in range(3):
+        interruptor.fallo()
+    reloj.ahora = 60
+    assert interruptor.permite()
+    # Un solo fallo en semiabierto basta, aunque la cuenta del umbral sea otra
+    interruptor.fallo()
+    assert interruptor.estado == InterruptorCircuito.ABIERTO
+    assert interruptor.aperturas == 2
+    assert interruptor.segundos_restantes() == 60
+    assert not interruptor.prueba_en_curso
+
+
+def test_circuito_abierto_cuenta_como_rechazada(reloj, sin_esperas):
+    cliente = cliente_con([OSError('caída')] * 3, reloj)
+    for _ in range(3):
+        with pytest.raises(ErrorSIIAU) as error:
+            cliente.descargar('url', presupuesto=5)
+        assert not isinstance(error.value, CircuitoAbierto)
+    with pytest.raises(CircuitoAbierto):
+        cliente.descargar('url', presupuesto=5)
+    assert cliente.contadores['consultas'] == 4
+    assert cliente.contadores['fallos'] == 3
+    assert cliente.contadores['rechazadas'] == 1
+    # La consulta rechazada no llegó a hacer una petición
+    assert cliente.contadores['peticiones'] == 3
+
+
+def test_reintenta_errores_de_red(reloj, sin_esperas):
+    cliente = cliente_con([OSError('caída'), b'ok'], reloj, reintentos=2)
+    assert cliente.descargar('url', presupuesto=5) == b'ok'
+    assert cliente.contadores['reintentos'] == 1
+    assert cliente.contadores['exitos'] == 1
+    assert cliente.interruptor.fallos_consecutivos == 0
+
+
+def test_error_de_procesar_es_fallo_sin_reintento(reloj, sin_esperas):
+    cliente = cliente_con([b'mantenimiento', b'ok', b'ok'], reloj, reintentos=2)
+
+    def procesar(cuerpo):
+        raise ErrorSIIAU('la página no tiene materias')
+
+    with pytest.raises(ErrorSIIAU):
+        cliente.descargar('url', presupuesto=5, procesar=procesar)
+    assert cliente.contadores['peticiones'] == 1
+    assert cliente.contadores['reintentos'] == 0
+    assert cliente.contadores['exitos'] == 0
+    assert cliente.contadores['fallos'] == 1
+    assert cliente.interruptor.fallos_consecutivos == 1
@@ -0,0 +1,101 @@
+import asyncio
+import zlib
+from datetime import datetime, timedelta
+
+from conftest import Contexto, fila, snapshot
+from siiau_monitor_bot import CuposBot, MotorResumen
+
+
+def suscribir(bot, user_id, *nrcs):
+    bot.suscripciones[user_id] = {
+        nrc: CuposBot.nueva_suscripcion_nrc(bot.monitor.materias_cache[nrc]) for nrc in nrcs
+    }
+
+
+def correr_resumenes(bot, contexto, reloj, minutos):
+    for _ in range(minutos):
+        reloj[0] += timedelta(minutes=1)
+        asyncio.run(bot.resumen_suscripciones(contexto))
+
+
+def test_primera_evaluacion_solo_registra_la_ranura():
+    motor = MotorResumen()
+    assert not motor.toca_enviar('7', 10_000.0)
+    assert '7' in motor.ultima_ranura
+    # En la misma ranura tampoco se envía
+    assert not motor.toca_enviar('7', 10_060.0)
+
+
+def test_un_envio_por_ranura_con_desfase_crc32():
+    periodo = MotorResumen.FRECUENCIA_DEFAULT * 60
+    for user_id in ('7', '123456', '99887766'):
+        desfase = MotorResumen.desfase(user_id, periodo)
+        assert desfase == zlib.crc32(user_id.encode()) % periodo
+        motor = MotorResumen()
+        envios = [t for t in range(0, 3 * 3600 + 1, MotorResumen.INTERVALO_TICK) if motor.toca_enviar(user_id, t)]
+        inicios = [desfase + k * periodo for k in range(7) if 0 < desfase + k * periodo <= 3 * 3600]
+        assert len(envios) == len(inicios)
+        # Cada envío es el primer tick después del inicio de la ranura del usuario
+        for enviado, inicio in zip(envios, inicios):
+            assert inicio <= enviado < inicio + MotorResumen.INTERVALO_TICK
+
+
+def test_sin_cambios_no_se_reenvia(bot):
+    bot.monitor.aplicar_snapshot(snapshot([fila(1001, dis=2), fila(1002)]))
+    reloj = [datetime(2026, 1, 5, 8, 0)]
+    bot.reloj = lambda: reloj[0]
+    suscribir(bot, '7', '1001')
+    contexto = Contexto()
+
+    correr_resumenes(bot, contexto, reloj, 31)
+    assert len(contexto.bot.enviados) == 1
+    correr_resumenes(bot, contexto, reloj, 90)
+    assert len(contexto.bot.enviados) == 1
+
+    # Un cambio en otra materia no cuenta; uno en la suscrita sí
+    bot.monitor.aplicar_snapshot(snapshot([fila(1001, dis=2), fila(1002, dis=5)]))
+    correr_resumenes(bot, contexto, reloj, 31)
+    assert len(contexto.bot.enviados) == 1
+    bot.monitor.aplicar_snapshot(snapshot([fila(1001, dis=4), fila(1002, dis=5)]))
+    correr_resumenes(bot, contexto, reloj, 31)
+    assert len(contexto.bot.enviados) == 2
+
+
+def test_poda_usuarios_sin_suscripciones(bot):
+    bot.monitor.aplicar_snapshot(snapshot([fila(1001)]))
+    bot.reloj = lambda: datetime(2026, 1, 5, 8, 0)
+    suscribir(bot, '7', '1001')
+    bot.resumenes.ultima_ranura['8'] = 5
+    bot.resumenes.huellas['8'] = 'abcd0123'
+    bot.resumenes.configurar('8', 60)
+
+    asyncio.run(bot.resumen_suscripciones(Contexto()))
+    assert '8' not in bot.resumenes.huellas and '8' not in bot.resumenes.ultima_ranura
+    assert '7' in bot.resumenes.ultima_ranura
+    # La frecuencia elegida por el usuario se conserva
+    assert bot.resumenes.frecuencia('8') == 60
+
+
+def test_preferencias_sobreviven_un_reinicio(bot):
+    bot.monitor.aplicar_snapshot(snapshot([fila(1001, dis=1)]))
+    reloj = [datetime(2026, 1, 5, 8, 0)]
+    bot.reloj = lambda: reloj[0]
+    suscribir(bot, '7', '1001')
+    bot.resumenes.configurar('7', 10)
+    bot.resumenes.configurar('9', 120)
+    correr_resumenes(bot, Contexto(), reloj, 11)
+    assert bot.resumenes.huellas['7']
+
+    reiniciado = CuposBot()
+    assert reiniciado.resumenes.frecuencias == bot.resumenes.frecuencias
+    assert reiniciado.resumenes.ultima_ranura == bot.resumenes.ultima_ranura
+    assert reiniciado.resumenes.huellas == bot.resumenes.huellas
+    assert MotorResumen().exportar() == {}
+
+    # Con la huella restaurada, el reinicio no manda un resumen sin cambios
+    reiniciado.monitor.aplicar_snapshot(snapshot([fila(1001, dis=1)]))
+    reiniciado.suscripciones = bot.suscripciones
+    reiniciado.reloj = bot.reloj
+    contexto = Contexto()
+    correr_resumenes(reiniciado, contexto, reloj, 25)
+    assert contexto.bot.enviados == []
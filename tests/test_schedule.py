@@ -0,0 +1,110 @@
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from conftest import fila
+from schedule import MotorHorario, contar_horarios, mascara_clase, mascara_sesion
+from siiau_monitor_bot import BaseDatos
+
+HORAS = ['0700-0855', '0800-0955', '0900-1055', '1100-1255', '1300-1455']
+DIAS = ['L . I . . .', '. M . J . .', 'L . . . . .', '. . . . V .', '. . I . V .']
+
+
+def como_entero(mascara):
+    return sum(int(palabra) << (64 * i) for i, palabra in enumerate(mascara))
+
+
+def choca(a, b):
+    return bool(np.any(a & b))
+
+
+def test_hora_final_inclusiva():
+    # 0700-0855 ocupa las ranuras de 07:00 a 09:00 (2 a 5), no la de 09:00
+    assert como_entero(mascara_sesion('0700-0855', 'L . . . . .')) == 0b111100
+    temprano = mascara_sesion('0700-0855', 'L . . . . .')
+    assert not choca(temprano, mascara_sesion('0900-1055', 'L . . . . .'))
+    assert choca(temprano, mascara_sesion('0830-0955', 'L . . . . .'))
+    assert not choca(temprano, mascara_sesion('0700-0855', '. M . . . .'))
+
+
+def test_sabado_en_la_ultima_palabra():
+    mascara = mascara_sesion('2000-2155', '. . . . . S')
+    assert como_entero(mascara) >> 160 == 0b1111 << 28
+    assert mascara[0] == 0 and mascara[1] == 0
+
+
+@pytest.mark.parametrize('hora, dias', [
+    ('', 'L'),
+    ('ABC', 'L'),
+    ('0700', 'L'),
+    ('0900-0800', 'L'),
+    ('0700-0855', '. . . . . .'),
+    (None, 'L'),
+])
+def test_horas_no_interpretables(hora, dias):
+    assert mascara_sesion(hora, dias) is None
+
+
+def test_clase_sin_horario_valido_no_ocupa_ranuras():
+    clase = BaseDatos(datos=[fila(1, sesiones=(('POR ASIGNAR', 'L'),))]).NRCDict['1']
+    assert como_entero(mascara_clase(clase)) == 0
+
+
+def oferta_aleatoria(semilla, n_claves=4, por_clave=6):
+    rng = random.Random(semilla)
+    filas = []
+    for k in range(n_claves):
+        for s in range(por_clave):
+            sesiones = [(rng.choice(HORAS), rng.choice(DIAS)) for _ in range(rng.randint(1, 2))]
+            filas.append(fila(f"{k}{s:02d}", clave=f"IL{300 + k}", dis=rng.randint(0, 3), sesiones=sesiones))
+    bd = BaseDatos(datos=filas)
+    return {clave: list(secciones.values()) for clave, secciones in bd.ClaveDict.items()}
+
+
+@pytest.mark.parametrize('semilla', range(8))
+def test_combinaciones_coincide_con_fuerza_bruta(semilla):
+    secciones_por_clave = oferta_aleatoria(semilla)
+    versiones = {c.getNRC(): 1 for secciones in secciones_por_clave.values() for c in secciones}
+    motor = MotorHorario()
+
+    esperado = 0
+    for combinacion in itertools.product(*secciones_por_clave.values()):
+        mascaras = [mascara_clase(c) for c in combinacion]
+        if not any(choca(a, b) for a, b in itertools.combinations(mascaras, 2)):
+            esperado += 1
+
+    combinaciones, completo = motor.combinaciones(secciones_por_clave, versiones, limite=10 ** 6, tiempo_maximo=60)
+    assert completo
+    assert esperado > 0
+    assert sum(contar_horarios(c) for c in combinaciones) == esperado
+    for combinacion in combinaciones:
+        elegidas = [grupo[0] for grupo in combinacion.values()]
+        assert not any(choca(mascara_clase(a), mascara_clase(b)) for a, b in itertools.combinations(elegidas, 2))
+
+
+def oferta_sin_choques():
+    # Cada clave en un día distinto: las 27 combinaciones son válidas
+    dias = ['L . . . . .', '. M . . . .', '. . I . . .']
+    filas = [fila(f"{k}{s}", clave=f"IL{300 + k}", sesiones=((HORAS[s], dias[k]),))
+             for k in range(3) for s in range(3)]
+    return {clave: list(secciones.values()) for clave, secciones in BaseDatos(datos=filas).ClaveDict.items()}
+
+
+def test_sin_choques_enumera_todo():
+    combinaciones, completo = MotorHorario().combinaciones(oferta_sin_choques(), {})
+    assert completo
+    assert sum(contar_horarios(c) for c in combinaciones) == 27
+
+
+def test_limite_corta_la_busqueda():
+    combinaciones, completo = MotorHorario().combinaciones(oferta_sin_choques(), {}, limite=2)
+    assert len(combinaciones) == 2
+    assert not completo
+
+
+def test_tiempo_maximo_corta_la_busqueda():
+    combinaciones, completo = MotorHorario().combinaciones(oferta_sin_choques(), {}, tiempo_maximo=0)
+    assert combinaciones == []
+    assert not completo
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from conftest import Contexto, UpdateFalso, fila, snapshot
+
+
+def comando(bot, metodo, user_id, *args):
+    update = UpdateFalso(user_id)
+    asyncio.run(getattr(bot, metodo)(update, Contexto(*args)))
+    return update.respuestas[-1]
+
+
+# IL355 e IL356 son de quinto; el resto de quinto y todas las optativas no tienen secciones
+OFERTA = [fila(1001), fila(1002), fila(2001, clave='IL356', nombre='ESTRUCTURAS')]
+
+
+@pytest.fixture
+def con_oferta(bot):
+    bot.monitor.aplicar_snapshot(snapshot(OFERTA))
+    return bot
+
+
+def test_suscribir_varios_nrcs_y_claves(con_oferta):
+    respuesta = comando(con_oferta, 'suscribir', 7, '1001', '1002,', 'IL356', 'XX999')
+    assert set(con_oferta.suscripciones['7']) == {'1001', '1002', 'IL356'}
+    assert con_oferta.suscripciones['7']['IL356']['tipo'] == 'clave'
+    assert '`XX999`' in respuesta.split('No encontrados:')[1]
+
+
+def test_suscribir_semestre_reporta_claves_sin_secciones(con_oferta):
+    respuesta = comando(con_oferta, 'suscribir', 7, 'quinto')
+    assert set(con_oferta.suscripciones['7']) == {'IL355', 'IL356'}
+    sin_secciones = respuesta.split('Sin secciones en la oferta:')[1]
+    for clave in ('IL361', 'IL364', 'IL366', 'IL369'):
+        assert f'`{clave}`' in sin_secciones
+    assert 'No encontrad' not in respuesta
+
+
+def test_suscribir_semestre_sin_ninguna_seccion(con_oferta):
+    respuesta = comando(con_oferta, 'suscribir', 7, 'optativas')
+    assert '7' not in con_oferta.suscripciones
+    assert 'No se encontró' not in respuesta
+    assert respuesta.startswith('⚠️ Sin secciones en la oferta:')
+    assert '`IL378`' in respuesta and '`IL383`' in respuesta
+
+
+def test_suscribir_no_reemplaza_las_existentes(con_oferta):
+    comando(con_oferta, 'suscribir', 7, '1001')
+    con_oferta.suscripciones['7']['1001']['last_notified'] = 'marca'
+    respuesta = comando(con_oferta, 'suscribir', 7, '1001', 'optativas')
+    assert con_oferta.suscripciones['7']['1001']['last_notified'] == 'marca'
+    assert 'Ya estabas suscrito a: `1001`' in respuesta
+    assert 'Sin secciones en la oferta:' in respuesta
+
+
+def test_desuscribir_semestre_y_codigos(con_oferta):
+    comando(con_oferta, 'suscribir', 7, '1001', '1002', 'IL356')
+    respuesta = comando(con_oferta, 'desuscribir', 7, 'IL355', 'XX999')
+    # La clave quita sus dos NRCs; el código desconocido se reporta
+    assert set(con_oferta.suscripciones['7']) == {'IL356'}
+    assert 'desuscrito de 2 suscripciones' in respuesta
+    assert 'No estabas suscrito a: `XX999`' in respuesta
+
+    comando(con_oferta, 'desuscribir', 7, 'quinto')
+    assert '7' not in con_oferta.suscripciones
+    assert 'IL356' not in con_oferta.comodines.por_clave
+
+
+def test_desuscribir_una_sola_con_codigo_sin_match(con_oferta):
+    comando(con_oferta, 'suscribir', 7, '1001', '1002')
+    respuesta = comando(con_oferta, 'desuscribir', 7, '1001', 'XX999')
+    assert set(con_oferta.suscripciones['7']) == {'1002'}
+    assert respuesta.startswith('✅ Te has desuscrito de: *ALGEBRA*')
+    assert 'No estabas suscrito a: `XX999`' in respuesta
+
+
+def test_desuscribir_sin_ninguna_coincidencia(con_oferta):
+    comando(con_oferta, 'suscribir', 7, '1001')
+    respuesta = comando(con_oferta, 'desuscribir', 7, 'XX999')
+    assert respuesta.startswith('❌ No estás suscrito a la materia: `XX999`')
+    assert set(con_oferta.suscripciones['7']) == {'1001'}
+
+
+def test_sin_alertas_por_nrc_con_snapshot_desactualizado(con_oferta):
+    comando(con_oferta, 'suscribir', 7, '1001')
+    con_oferta.monitor.aplicar_snapshot(snapshot([fila(1001, dis=4)] + OFERTA[1:]))
+
+    async def cache(sondear=False):
+        return con_oferta.monitor.materias_cache
+    con_oferta.actualizar_materias = cache
+
+    contexto = Contexto()
+    con_oferta.monitor.desactualizado = True
+    asyncio.run(con_oferta.monitorear_cupos(contexto))
+    assert contexto.bot.enviados == []
+
+    con_oferta.monitor.desactualizado = False
+    asyncio.run(con_oferta.monitorear_cupos(contexto))
+    assert [chat for chat, _ in contexto.bot.enviados] == ['7']